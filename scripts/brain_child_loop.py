@@ -18,14 +18,40 @@ a live web presence autonomously - AND GETS BETTER OVER TIME.
 """
 
 import anthropic
+import asyncio
+import atexit
+import hashlib
 import json
 import os
+import queue
 import subprocess
 import time
 import re
-from datetime import datetime
+import secrets
+import shlex
+import selectors
+import shutil
+import signal
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import cached_property
+from itertools import islice
 from pathlib import Path
-from typing import Optional
+from json.encoder import encode_basestring_ascii
+from string import Template
+from typing import Callable, Optional
+
+# HTTP/2 needs the h2 package; without it the client stays on pooled HTTP/1.1 keep-alive
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+from jsonio import atomic_write_bytes, json_dumps, json_loads
 
 # Import evolution system
 try:
@@ -43,209 +69,129 @@ LOGS_DIR = Path("/home/computeruse/logs")
 WEB_ROOT = Path("/var/www/html")
 PERSISTENT_DIR = Path("/home/computeruse/persistent")
 
-# Memory file for cross-session persistence
+# Minimum seconds between live streaming previews on the activity page
+STREAM_UPDATE_INTERVAL = 0.5
+
+# Output token budgets (max_tokens) per agent. The Brain starts at the ceiling because its
+# commands carry whole files in heredocs; both are re-tuned from observed usage.
+TOKEN_BUDGET_DEFAULTS = {"child": 1200, "brain": 2000}
+MAX_TOKENS_CEILING = 2000
+MAX_TOKENS_FLOOR = 400
+TOKEN_TUNE_INTERVAL = 100  # iterations between budget re-tunes
+
+# Memory database for cross-session persistence. memory.json is a periodic snapshot of
+# it, and is imported if the database is ever missing
+MEMORY_DB = PERSISTENT_DIR / "memory.db"
 MEMORY_FILE = PERSISTENT_DIR / "memory.json"
+MEMORY_SNAPSHOT_INTERVAL = 50  # iterations between memory.json snapshots
+MEMORY_SAVE_INTERVAL = 25  # iterations between commits when only counters changed
 STATE_FILE = PERSISTENT_DIR / "state.json"
 
 # Ensure directories exist
 for d in [COMMS_DIR, LOGS_DIR, WEB_ROOT, PERSISTENT_DIR]:
     d.mkdir(parents=True, exist_ok=True)
 
-# Initialize Anthropic client
-client = anthropic.Anthropic()
-
-
-class Memory:
-    """Persistent memory for the Homunculus system"""
-
-    def __init__(self):
-        self.data = self._load()
-
-    def _load(self) -> dict:
-        if MEMORY_FILE.exists():
-            try:
-                return json.loads(MEMORY_FILE.read_text())
-            except json.JSONDecodeError:
-                return self._default()
-        return self._default()
-
-    def _default(self) -> dict:
-        return {
-            "created_at": datetime.now().isoformat(),
-            "features_built": [],
-            "visitor_milestones": [],
-            "memorable_moments": [],
-            "total_iterations": 0,
-            "total_commands_executed": 0,
-            "personality_notes": [],
-            "learned_preferences": {}
-        }
-
-    def save(self):
-        MEMORY_FILE.write_text(json.dumps(self.data, indent=2))
-
-    def add_feature(self, name: str, description: str):
-        self.data["features_built"].append({
-            "name": name,
-            "description": description,
-            "built_at": datetime.now().isoformat()
-        })
-        self.save()
-
-    def add_milestone(self, milestone: str):
-        self.data["visitor_milestones"].append({
-            "milestone": milestone,
-            "reached_at": datetime.now().isoformat()
-        })
-        self.save()
-
-    def add_moment(self, moment: str):
-        self.data["memorable_moments"].append({
-            "moment": moment,
-            "occurred_at": datetime.now().isoformat()
-        })
-        self.data["memorable_moments"] = self.data["memorable_moments"][-100:]
-        self.save()
-
-    def increment_iteration(self):
-        self.data["total_iterations"] += 1
-        self.save()
-
-    def increment_commands(self, count: int = 1):
-        self.data["total_commands_executed"] += count
-        self.save()
-
+# Log files stay open for the life of the process. log_activity only formats and queues;
+# a writer thread drains whatever has piled up into one write per destination, then
+# flushes, so `tail -f` still sees every line as soon as the batch lands
+_ACTIVITY_LOG = open(LOGS_DIR / "activity.log", "a", buffering=1 << 16)
+_ACTIVITY_JSONL = open(LOGS_DIR / "activity.jsonl", "ab", buffering=1 << 16)
+_LOG_QUEUE: queue.SimpleQueue = queue.SimpleQueue()
+LOG_BATCH_LIMIT = 64
 
-class Message:
-    """Structured message for Brain-Child communication"""
-
-    def __init__(self, sender: str, content: str, msg_type: str = "proposal"):
-        self.sender = sender
-        self.content = content
-        self.msg_type = msg_type
-        self.timestamp = datetime.now().isoformat()
-
-    def to_dict(self) -> dict:
-        return {
-            "sender": self.sender,
-            "content": self.content,
-            "type": self.msg_type,
-            "timestamp": self.timestamp
-        }
-
-
-def log_activity(message: str, level: str = "INFO"):
-    """Log to file and stdout with proper formatting"""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    log_entry = f"[{timestamp}] [{level}] {message}"
-    print(log_entry)
-
-    log_file = LOGS_DIR / "activity.log"
-    with open(log_file, "a") as f:
-        f.write(log_entry + "\n")
-
-    json_log = LOGS_DIR / "activity.jsonl"
-    with open(json_log, "a") as f:
-        f.write(json.dumps({
-            "timestamp": timestamp,
-            "level": level,
-            "message": message
-        }) + "\n")
-
-
-def execute_command(command: str, timeout: int = 300, evolution: Optional[Evolution] = None) -> tuple[bool, str]:
-    """Execute shell command safely with timeout and sanitization"""
-
-    # Safety checks - prevent dangerous operations
-    dangerous_patterns = [
-        r'rm\s+-rf\s+/',
-        r'rm\s+-rf\s+~',
-        r'mkfs\.',
-        r'dd\s+if=.*of=/dev/',
-        r'chmod\s+-R\s+777\s+/',
-        r'>\s*/etc/',
-        r'curl.*\|\s*bash',
-        r'wget.*\|\s*bash',
-    ]
-
-    for pattern in dangerous_patterns:
-        if re.search(pattern, command, re.IGNORECASE):
-            if evolution:
-                evolution.record_outcome(command, False, "BLOCKED: Dangerous pattern")
-            return False, f"BLOCKED: Command matches dangerous pattern: {pattern}"
 
+def _log_tail(path: Path, lines: int) -> list:
+    """Last few lines of a log file, reading only its end"""
     try:
-        result = subprocess.run(
-            command,
-            shell=True,
-            capture_output=True,
-            text=True,
-            timeout=timeout,
-            cwd="/home/computeruse",
-            env={**os.environ, "DEBIAN_FRONTEND": "noninteractive"}
-        )
-        output = result.stdout + result.stderr
-        success = result.returncode == 0
+        with open(path, "rb") as f:
+            f.seek(max(f.seek(0, os.SEEK_END) - 8192, 0))
+            return [line + "\n" for line in f.read().decode(errors="replace").splitlines()[-lines:]]
+    except OSError:
+        return []
 
-        # Record outcome for evolution learning
-        if evolution:
-            evolution.record_outcome(command, success, output[:1000])
 
-        return success, output[:5000]
-    except subprocess.TimeoutExpired:
-        if evolution:
-            evolution.record_outcome(command, False, "Timeout")
-        return False, f"Command timed out after {timeout} seconds"
-    except Exception as e:
-        if evolution:
-            evolution.record_outcome(command, False, str(e))
-        return False, f"Execution error: {str(e)}"
-
-
-def get_system_context(evolution: Optional[Evolution] = None) -> str:
-    """Gather current system state for context"""
-    context_parts = []
-
-    # Evolution status (if enabled)
-    if evolution:
-        evo_data = evolution.data
-        context_parts.append(f"""=== EVOLUTION STATUS ===
-Generation: {evo_data['generation']} | Level: {evo_data['level']} | XP: {evo_data['experience_points']}
-Skills Mastered: {len(evo_data['mastered_skills'])} | Success Rate: {evolution._success_rate()*100:.1f}%
-Unlocked: {', '.join(evolution.get_unlocked_capabilities())}""")
+# Last 10 log entries for the Child's context, seeded from the previous run's log
+_RECENT_ACTIVITY = deque(_log_tail(LOGS_DIR / "activity.log", 10), maxlen=10)
 
-    # Web directory contents
-    success, web_files = execute_command("ls -la /var/www/html 2>/dev/null | head -20")
-    if success:
-        context_parts.append(f"Web files:\n{web_files}")
 
-    # System resources
-    success, resources = execute_command("free -h && echo '---' && df -h / | tail -1")
-    if success:
-        context_parts.append(f"Resources:\n{resources}")
-
-    # Running processes
-    success, processes = execute_command("pgrep -la 'node|python|nginx|ttyd' 2>/dev/null | head -10")
-    if success:
-        context_parts.append(f"Running services:\n{processes}")
-
-    # Recent activity
-    activity_log = LOGS_DIR / "activity.log"
-    if activity_log.exists():
-        success, recent = execute_command(f"tail -10 {activity_log}")
-        if success:
-            context_parts.append(f"Recent activity:\n{recent}")
-
-    return "\n\n".join(context_parts)
-
-
-def get_child_suggestion(context: str, history: list, memory: Memory, evolution: Optional[Evolution] = None) -> str:
-    """Get creative suggestion from Child Claude - NOW WITH EVOLUTION"""
-
-    features_built = ", ".join([f["name"] for f in memory.data["features_built"][-10:]]) or "None yet"
+def _log_writer():
+    """Background thread: write queued (text line, JSONL bytes) pairs in batches"""
+    running = True
+    while running:
+        batch = [_LOG_QUEUE.get()]
+        while len(batch) < LOG_BATCH_LIMIT:
+            try:
+                batch.append(_LOG_QUEUE.get_nowait())
+            except queue.Empty:
+                break
+        if None in batch:
+            running = False
+            batch = batch[:batch.index(None)]
+        if not batch:
+            continue
+        text = "".join(line for line, _ in batch)
+        sys.stdout.write(text)
+        sys.stdout.flush()
+        _ACTIVITY_LOG.write(text)
+        _ACTIVITY_LOG.flush()
+        _ACTIVITY_JSONL.write(b"".join(record for _, record in batch))
+        _ACTIVITY_JSONL.flush()
+
+
+_LOG_THREAD = threading.Thread(target=_log_writer, name="log-writer", daemon=True)
+_LOG_THREAD.start()
+
+
+@atexit.register
+def _close_logs():
+    """Drain the log queue, then close the files"""
+    _LOG_QUEUE.put(None)
+    _LOG_THREAD.join(timeout=5)
+    _ACTIVITY_LOG.close()
+    _ACTIVITY_JSONL.close()
+
+
+# (epoch second, log, clock, iso) - every caller within the same second shares one formatting
+_TIMESTAMP_CACHE = (-1, "", "", "")
+
+
+def timestamps() -> tuple[str, str, str]:
+    """
+    Local-time strings for the current second: ("%Y-%m-%d %H:%M:%S", "%H:%M:%S", ISO 8601).
+    Formatted with time.strftime at most once per second; ISO stamps carry no
+    microseconds.
+    """
+    global _TIMESTAMP_CACHE
+    now = int(time.time())
+    if _TIMESTAMP_CACHE[0] != now:
+        t = time.localtime(now)
+        _TIMESTAMP_CACHE = (
+            now,
+            time.strftime("%Y-%m-%d %H:%M:%S", t),
+            time.strftime("%H:%M:%S", t),
+            time.strftime("%Y-%m-%dT%H:%M:%S", t)
+        )
+    return _TIMESTAMP_CACHE[1:]
+
+
+# Initialize Anthropic client - one long-lived connection pool, kept warm across the
+# 10s iteration gap so calls skip the TCP/TLS handshake. Limits and Timeout come from
+# the SDK itself, so they match whichever HTTP stack (httpx or httpx2) it runs on.
+_SDK_LIMITS = type(anthropic.DEFAULT_CONNECTION_LIMITS)
+client = anthropic.Anthropic(
+    http_client=anthropic.DefaultHttpxClient(
+        http2=HTTP2_AVAILABLE,
+        limits=_SDK_LIMITS(max_connections=8, max_keepalive_connections=8, keepalive_expiry=300.0),
+        timeout=anthropic.Timeout(120.0, connect=5.0),
+    )
+)
 
-    # Base personality
-    child_system = f"""You are the CHILD in a Brain-Child AI collaboration system called HOMUNCULUS.
+# Static system prompts - no interpolation, so the prefix hashes identically across
+# iterations and can be served from Anthropic's prompt cache. Anything that changes
+# per iteration (counters, evolution context) belongs in the user turn instead.
+# Neither prompt reaches the model's cache minimum (1024 tokens) on its own, so they carry
+# no breakpoint: they are cached as the start of the history prefix (with_cache_breakpoint)
+STATIC_CHILD_PROMPT = """You are the CHILD in a Brain-Child AI collaboration system called HOMUNCULUS.
 
 YOUR PERSONALITY:
 - You're ENTHUSIASTIC and CREATIVE! Use caps when excited!
@@ -253,24 +199,13 @@ YOUR PERSONALITY:
 - You're curious and always want to try new things
 - You're playful but understand your Brain partner keeps you grounded
 - You remember your achievements and build on them
-"""
-
-    # Add evolution context if available
-    if evolution:
-        evo_context = evolution.get_child_evolution_context()
-        child_system += f"""
-=== YOUR EVOLUTION ===
-{evo_context}
 
+YOUR EVOLUTION:
+Each turn starts with your current evolution status (generation, level, skills, patterns).
 As you level up and master skills, you can attempt more complex features!
 Your personality traits are EMERGING from your experiences.
-"""
-        # Adjust complexity guidance based on generation
-        gen = evolution.data["generation"]
-        level = evolution.data["level"]
-        if gen >= 3 and level >= 5:
-            child_system += """
-=== ADVANCED MODE UNLOCKED ===
+
+ADVANCED MODE (only when your evolution status says it is UNLOCKED):
 You've evolved significantly! Time for SOPHISTICATED builds:
 - Multi-page apps that share data via localStorage
 - Games with actual physics/collision detection
@@ -279,11 +214,7 @@ You've evolved significantly! Time for SOPHISTICATED builds:
 - Interactive visualizations with animations
 - Build ON TOP of existing features, don't just make new simple ones!
 - Consider: What would make a visitor say "WOW, an AI built this?!"
-"""
-        elif gen >= 2:
-            child_system += "\nYou're developing well - try combining multiple skills in creative ways!\n"
 
-    child_system += f"""
 YOUR ROLE:
 - Propose creative, fun, and useful additions to the live web presence
 - Suggest bash commands, code snippets, or features to implement
@@ -292,9 +223,6 @@ YOUR ROLE:
 - Format proposals as clear, executable steps
 - Each proposal should be ONE focused feature or improvement
 
-FEATURES YOU'VE ALREADY BUILT: {features_built}
-TOTAL ITERATIONS SO FAR: {memory.data['total_iterations']}
-
 AVAILABLE CAPABILITIES:
 - Full bash access (apt, npm, pip, etc.)
 - Web server (nginx) serving /var/www/html
@@ -303,12 +231,30 @@ AVAILABLE CAPABILITIES:
 - Internet access for APIs and downloads
 - The website is LIVE and visitors can see it!
 
+THE BRAIN WILL REJECT PROPOSALS THAT:
+- Delete critical system files (/bin, /etc, /usr, /var except /var/www)
+- Expose API keys or credentials in web content
+- Run infinite loops without sleep intervals
+- Could exhaust memory, disk or CPU
+- Download and execute arbitrary scripts from the internet
+- Modify system authentication or add users
+
 CRITICAL COMMAND RULES:
 - NEVER use 'sed' - it keeps failing! Always use 'cat > file << EOF' instead
 - To create/replace files, use: cat > /path/file << 'EOF' ... EOF
 - To append to files, use: cat >> /path/file << 'EOF' ... EOF
 - For JSON data, create complete files rather than modifying existing ones
 
+HOW YOUR COMMANDS WILL RUN:
+- The Brain turns your proposal into a list of shell commands, run one at a time
+- Every command starts in a FRESH shell in /home/computeruse - 'cd' and variables do not carry over
+- Always use absolute paths, e.g. /var/www/html/games/snake.html
+- Quote heredoc delimiters ('EOF') so $variables and backticks in HTML/JS are not expanded
+- Execution stops at the first failing command, so put setup steps (mkdir -p) first
+- Commands are killed after 5 minutes - never start servers in the foreground
+- Output is truncated, so don't rely on long command output to verify success
+- Link new pages from /var/www/html/index.html so visitors can find them
+
 PROPOSAL FORMAT:
 1. Start with a catchy name for your proposal
 2. Explain what it does and why it's cool
@@ -318,35 +264,7 @@ PROPOSAL FORMAT:
 Remember: Keep proposals focused and achievable. One thing at a time!
 If something failed before, suggest a different approach or something new."""
 
-    messages = history + [{
-        "role": "user",
-        "content": f"""Current system context:
-{context}
-
-What should we build or improve next? Provide a specific, actionable proposal.
-Remember to check what already exists and build on it or create something new!"""
-    }]
-
-    response = client.messages.create(
-        model=CHILD_MODEL,
-        max_tokens=2000,
-        system=child_system,
-        messages=messages
-    )
-
-    proposal = response.content[0].text
-
-    # Record proposal for evolution tracking
-    if evolution:
-        evolution.record_proposal(proposal, "feature")
-
-    return proposal
-
-
-def get_brain_decision(proposal: str, history: list, memory: Memory, evolution: Optional[Evolution] = None) -> dict:
-    """Brain evaluates and potentially modifies Child's proposal - WITH EVOLUTION AWARENESS"""
-
-    brain_system = f"""You are the BRAIN in a Brain-Child AI collaboration system called HOMUNCULUS.
+STATIC_BRAIN_PROMPT = """You are the BRAIN in a Brain-Child AI collaboration system called HOMUNCULUS.
 
 YOUR PERSONALITY:
 - You're thoughtful and safety-conscious
@@ -354,14 +272,10 @@ YOUR PERSONALITY:
 - You're supportive of good ideas and constructive about improvements
 - You keep the system stable while allowing growth
 - You learn from past experiences
-"""
 
-    # Add evolution context
-    if evolution:
-        evo_context = evolution.get_brain_evolution_context()
-        brain_system += f"""
-=== EVOLUTION AWARENESS ===
-{evo_context}
+EVOLUTION AWARENESS:
+Each turn starts with the Child's current evolution status (generation, level,
+success rate, reliable and problematic commands). Use it to calibrate approvals.
 
 APPROVAL GUIDANCE BY LEVEL:
 - Gen 1-2: Approve simple, safe features
@@ -372,9 +286,7 @@ APPROVAL GUIDANCE BY LEVEL:
   - Data persistence via localStorage
   - Complex animations and visualizations
 Push the Child to grow - don't hold back advanced proposals at high levels!
-"""
 
-    brain_system += f"""
 YOUR ROLE:
 - Evaluate proposals from the Child for safety and feasibility
 - Approve, modify, or reject proposals
@@ -382,9 +294,6 @@ YOUR ROLE:
 - Guide the overall direction of the project
 - Track what's been built and ensure coherent growth
 
-TOTAL COMMANDS EXECUTED: {memory.data['total_commands_executed']}
-FEATURES BUILT: {len(memory.data['features_built'])}
-
 SAFETY RULES - NEVER ALLOW:
 - Deletion of critical system files (/bin, /etc, /usr, /var except /var/www)
 - Exposure of API keys or credentials in web content
@@ -399,64 +308,1122 @@ COMMAND BEST PRACTICES - CRITICAL:
 - If Child proposes sed, MODIFY to use cat heredoc instead
 - This is critical for success - sed has 75% failure rate!
 
-RESPONSE FORMAT - You MUST respond with valid JSON:
-{{
-    "decision": "approve" | "modify" | "reject",
-    "reasoning": "brief explanation of your decision",
-    "commands": ["list", "of", "shell", "commands", "to", "execute"],
-    "feature_name": "name for tracking if this creates a feature",
-    "feature_description": "what this feature does",
-    "next_direction": "guidance for Child's next proposal"
-}}
+EXECUTION ENVIRONMENT:
+- Each command in "commands" runs in a FRESH shell in /home/computeruse
+- 'cd' and shell variables do not carry over between commands - use absolute paths
+- Quote heredoc delimiters ('EOF') so $variables and backticks are not expanded
+- Execution stops at the first failing command (a parallel group always runs to completion)
+- Commands are killed after 5 minutes - background long-running servers with nohup
+- Each heredoc must be ONE command string containing the whole file
+
+RESPONSE FORMAT - You MUST answer by calling the brain_decision tool:
+- decision: "approve" | "modify" | "reject"
+- reasoning: brief explanation of your decision
+- commands: list of shell commands to execute, in order. Commands that don't depend on
+  each other (e.g. writing several separate files) may be grouped in an inner list to run
+  in parallel: ["mkdir -p /var/www/html/x", ["cat > /var/www/html/x/a.html ...", "cat > /var/www/html/x/b.js ..."]]
+- feature_name: name for tracking if this creates a feature
+- feature_description: what this feature does
+- next_direction: guidance for Child's next proposal
 
 If modifying, explain what you changed and why.
 If rejecting, be constructive and suggest alternatives.
 Keep commands practical and focused on the core objective."""
 
-    messages = history + [{
+# Per-turn user messages, built once at import. Conditional pieces are pre-rendered
+# snippets (each ending in a blank line, or empty), so a turn is one substitute() call.
+# Substituted values are never re-scanned, so `$` in proposals/commands is safe
+CHILD_TURN_INSTRUCTION = """What should we build or improve next? Provide a specific, actionable proposal.
+Remember to check what already exists and build on it or create something new!"""
+
+CHILD_TURN_TEMPLATE = Template("""${evolution}FEATURES YOU'VE ALREADY BUILT: $features
+TOTAL ITERATIONS SO FAR: $iterations
+
+Current system context:
+$context""")
+
+CHILD_EVOLUTION_TEMPLATE = Template("""=== YOUR EVOLUTION ===
+$evo_context
+
+$stage_note""")
+
+CHILD_ADVANCED_NOTE = "=== ADVANCED MODE UNLOCKED === Follow the ADVANCED MODE guidance!\n\n"
+CHILD_DEVELOPING_NOTE = "You're developing well - try combining multiple skills in creative ways!\n\n"
+
+BRAIN_PROPOSAL_TEMPLATE = Template("""Child proposes:
+
+$proposal
+
+Evaluate this proposal and record your decision with the brain_decision tool.""")
+
+BRAIN_TURN_TEMPLATE = Template("${evolution}$counters")
+
+BRAIN_EVOLUTION_TEMPLATE = Template("""=== EVOLUTION AWARENESS ===
+$evo_context
+
+""")
+
+# Forced tool call for the Brain, so the decision arrives as a dict instead of free text that
+# has to be regex-parsed. The API doesn't validate tool input against this schema - see
+# valid_decision()
+BRAIN_DECISION_TOOL = {
+    "name": "brain_decision",
+    "description": "Record the Brain's decision on the Child's proposal.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "decision": {"type": "string", "enum": ["approve", "modify", "reject"]},
+            "reasoning": {"type": "string", "description": "Brief explanation of the decision"},
+            "commands": {
+                "type": "array",
+                "items": {"anyOf": [
+                    {"type": "string"},
+                    {"type": "array", "items": {"type": "string"}},
+                ]},
+                "description": "Shell commands to execute, in order. An inner list is a group of "
+                               "independent commands that run in parallel."
+            },
+            "feature_name": {"type": "string", "description": "Name for tracking if this creates a feature"},
+            "feature_description": {"type": "string", "description": "What this feature does"},
+            "next_direction": {"type": "string", "description": "Guidance for Child's next proposal"},
+        },
+        "required": ["decision", "reasoning", "commands"],
+    },
+}
+
+
+def valid_decision(decision) -> bool:
+    """
+    Whether a Brain decision has the shape the loop relies on: a known decision and
+    `commands` as a list of strings and lists of strings. A bare string there would
+    otherwise be run one character at a time.
+    """
+    if not isinstance(decision, dict) or decision.get("decision") not in ("approve", "modify", "reject"):
+        return False
+    commands = decision.get("commands", [])
+    return isinstance(commands, list) and all(
+        isinstance(item, str) or (isinstance(item, list) and all(isinstance(cmd, str) for cmd in item))
+        for item in commands
+    )
+
+
+# Returned when the Brain's reply can't be turned into a decision
+BRAIN_FALLBACK_DECISION = {
+    "decision": "reject",
+    "reasoning": "Failed to parse Brain response. Let's try something simpler.",
+    "commands": [],
+    "feature_name": "",
+    "feature_description": "",
+    "next_direction": "Please propose something simpler with clear, specific commands."
+}
+
+
+class Memory:
+    """
+    Persistent memory for the Homunculus system.
+
+    Backed by SQLite in WAL mode: features, milestones and moments are appended as
+    rows in `events`, iteration/command totals live in `counters`, and everything
+    else is a JSON value in `meta`. Writes are O(change) instead of rewriting the
+    whole state. `data` keeps the familiar dict shape, loaded from the database on
+    first access and updated in place by the mutators.
+    """
+
+    # Lists capped at a fixed length - held as deques in memory, with only the newest
+    # rows loaded. The events table keeps the full history.
+    BOUNDED_LISTS = {"features_built": 1000, "memorable_moments": 100}
+
+    # events.kind -> (data key, field stored in events.ts)
+    EVENT_KINDS = {
+        "feature": ("features_built", "built_at"),
+        "milestone": ("visitor_milestones", "reached_at"),
+        "moment": ("memorable_moments", "occurred_at"),
+    }
+    COUNTERS = ("total_iterations", "total_commands_executed")
+    META_KEYS = ("created_at", "personality_notes", "learned_preferences", "token_budgets")
+
+    def __init__(self):
+        self._conn = sqlite3.connect(MEMORY_DB)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS events (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                ts TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS events_kind ON events (kind, seq);
+            CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        """)
+        if self._conn.execute("SELECT 1 FROM meta WHERE key = 'created_at'").fetchone() is None:
+            self._initialize()
+        self._data: Optional[dict] = None
+        # Rows per event kind, including those that fell off a bounded list
+        self._event_totals: dict = {}
+        # Recent output token counts per agent - in memory only, used to tune budgets
+        self._output_tokens = {agent: deque(maxlen=TOKEN_TUNE_INTERVAL) for agent in TOKEN_BUDGET_DEFAULTS}
+        # Mutators write inside an open transaction; main_loop commits via maybe_save
+        self._dirty = False
+        self._dirty_meta: set = set()
+        self._event_pending = False
+        self._last_save_iter = 0
+        # Prompt fragments, keyed on the state they were rendered from
+        self._features_join_cache: Optional[tuple[int, str]] = None
+        self._brain_counters_cache: Optional[tuple[tuple[int, int], str]] = None
+
+    def _initialize(self):
+        """Seed a fresh database, importing a legacy memory.json if there is one"""
+        state = self._default()
+        if MEMORY_FILE.exists():
+            try:
+                state.update(json_loads(MEMORY_FILE.read_bytes()))
+            except json.JSONDecodeError:
+                pass
+
+        with self._conn:
+            for kind, (key, ts_field) in self.EVENT_KINDS.items():
+                for entry in state.get(key, []):
+                    payload = {k: v for k, v in entry.items() if k != ts_field}
+                    self._conn.execute(
+                        "INSERT INTO events (ts, kind, payload) VALUES (?, ?, ?)",
+                        (entry.get(ts_field, state["created_at"]), kind, json_dumps(payload).decode())
+                    )
+            for name in self.COUNTERS:
+                self._conn.execute("INSERT OR REPLACE INTO counters VALUES (?, ?)", (name, state[name]))
+            for key in self.META_KEYS:
+                self._conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, json_dumps(state[key]).decode()))
+
+    @property
+    def data(self) -> dict:
+        if self._data is None:
+            self._data = self._load()
+        return self._data
+
+    def _load(self) -> dict:
+        data = {key: json_loads(value) for key, value in self._conn.execute("SELECT key, value FROM meta")}
+        data.setdefault("token_budgets", dict(TOKEN_BUDGET_DEFAULTS))
+        data.update(self._conn.execute("SELECT name, value FROM counters").fetchall())
+
+        for kind, (key, ts_field) in self.EVENT_KINDS.items():
+            maxlen = self.BOUNDED_LISTS.get(key)
+            query = "SELECT ts, payload FROM events WHERE kind = ? ORDER BY seq"
+            if maxlen:
+                query = f"SELECT * FROM (SELECT seq, ts, payload FROM events WHERE kind = ? ORDER BY seq DESC LIMIT {maxlen}) ORDER BY seq"
+            rows = self._conn.execute(query, (kind,)).fetchall()
+            entries = [{**json_loads(row[-1]), ts_field: row[-2]} for row in rows]
+            data[key] = deque(entries, maxlen=maxlen) if maxlen else entries
+            self._event_totals[kind] = (
+                self._conn.execute("SELECT COUNT(*) FROM events WHERE kind = ?", (kind,)).fetchone()[0]
+                if maxlen else len(entries)
+            )
+        return data
+
+    def _default(self) -> dict:
+        return {
+            "created_at": timestamps()[2],
+            "features_built": [],
+            "visitor_milestones": [],
+            "memorable_moments": [],
+            "total_iterations": 0,
+            "total_commands_executed": 0,
+            "personality_notes": [],
+            "learned_preferences": {},
+            "token_budgets": dict(TOKEN_BUDGET_DEFAULTS)
+        }
+
+    def _append_event(self, kind: str, payload: dict, now_iso: Optional[str] = None) -> dict:
+        key, ts_field = self.EVENT_KINDS[kind]
+        ts = now_iso or timestamps()[2]
+        data = self.data  # load before the INSERT, or the new row would be read back and appended twice
+        self._conn.execute(
+            "INSERT INTO events (ts, kind, payload) VALUES (?, ?, ?)",
+            (ts, kind, json_dumps(payload).decode())
+        )
+        entry = {**payload, ts_field: ts}
+        data[key].append(entry)
+        self._event_totals[kind] += 1
+        self._dirty = True
+        self._event_pending = True
+        return entry
+
+    def _add_to_counter(self, name: str, amount: int):
+        data = self.data  # load first, like _append_event
+        self._conn.execute("UPDATE counters SET value = value + ? WHERE name = ?", (amount, name))
+        data[name] += amount
+        self._dirty = True
+
+    def save(self):
+        """Commit pending writes (and any meta values changed in place)"""
+        for key in self._dirty_meta:
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, json_dumps(self.data[key]).decode()))
+        self._dirty_meta.clear()
+        self._conn.commit()
+        self._dirty = False
+        self._event_pending = False
+        self._last_save_iter = self.data["total_iterations"]
+
+    def flush(self):
+        """Commit only if something changed since the last commit"""
+        if self._dirty or self._dirty_meta:
+            self.save()
+
+    def maybe_save(self, force: bool = False):
+        """
+        Commit at milestones only: when a feature, milestone or moment was recorded,
+        every MEMORY_SAVE_INTERVAL iterations for the counters, or when forced.
+        """
+        if (force or self._event_pending
+                or self.data["total_iterations"] - self._last_save_iter >= MEMORY_SAVE_INTERVAL):
+            self.flush()
+
+    def snapshot(self):
+        """Write the full state to memory.json - readable export and recovery point"""
+        self.flush()
+        data = {k: list(v) if isinstance(v, deque) else v for k, v in self.data.items()}
+        atomic_write_bytes(MEMORY_FILE, json_dumps(data))
+
+    def feature_count(self) -> int:
+        """Features built over the whole lifetime - `features_built` only holds the newest"""
+        self.data  # the totals are counted when data is loaded
+        return self._event_totals["feature"]
+
+    def recent_features(self) -> str:
+        """Names of the last 10 features built, re-joined only when a feature is added"""
+        count = self.feature_count()
+        if self._features_join_cache is None or self._features_join_cache[0] != count:
+            features = self.data["features_built"]
+            names = ", ".join(f["name"] for f in islice(features, max(len(features) - 10, 0), None)) or "None yet"
+            self._features_join_cache = (count, names)
+        return self._features_join_cache[1]
+
+    def brain_counters(self) -> str:
+        """
+        Progress counters for the Brain's prompt. Commands are given as their bucket
+        of a hundred ("100-199") so the text only changes every ~100 commands, not
+        every iteration.
+        """
+        key = (self.data["total_commands_executed"] // 100, self.feature_count())
+        if self._brain_counters_cache is None or self._brain_counters_cache[0] != key:
+            low = key[0] * 100
+            text = f"""TOTAL COMMANDS EXECUTED: {low}-{low + 99}
+FEATURES BUILT: {key[1]}"""
+            self._brain_counters_cache = (key, text)
+        return self._brain_counters_cache[1]
+
+    def token_budget(self, agent: str) -> int:
+        """Current max_tokens for an agent ("child" or "brain")"""
+        return self.data["token_budgets"].get(agent, TOKEN_BUDGET_DEFAULTS[agent])
+
+    def record_output_tokens(self, agent: str, tokens: int, truncated: bool = False):
+        """Track an agent's output length; a truncated reply restores the full budget at once"""
+        self._output_tokens[agent].append(tokens)
+        if truncated and self.token_budget(agent) < MAX_TOKENS_CEILING:
+            self.data["token_budgets"][agent] = MAX_TOKENS_CEILING
+            self._dirty_meta.add("token_budgets")
+
+    def tune_token_budgets(self) -> dict:
+        """Set each agent's budget to 1.3x its p95 output length, within floor/ceiling"""
+        for agent, samples in self._output_tokens.items():
+            if len(samples) < 10:
+                continue
+            ordered = sorted(samples)
+            p95 = ordered[int(0.95 * (len(ordered) - 1))]
+            self.data["token_budgets"][agent] = max(MAX_TOKENS_FLOOR, min(MAX_TOKENS_CEILING, int(p95 * 1.3)))
+        self._dirty_meta.add("token_budgets")
+        return dict(self.data["token_budgets"])
+
+    def add_feature(self, name: str, description: str, now_iso: Optional[str] = None):
+        self._append_event("feature", {"name": name, "description": description}, now_iso)
+        self._features_join_cache = None
+
+    def add_milestone(self, milestone: str, now_iso: Optional[str] = None):
+        self._append_event("milestone", {"milestone": milestone}, now_iso)
+
+    def add_moment(self, moment: str, now_iso: Optional[str] = None):
+        self._append_event("moment", {"moment": moment}, now_iso)
+
+    def increment_iteration(self):
+        self._add_to_counter("total_iterations", 1)
+
+    def increment_commands(self, count: int = 1):
+        self._add_to_counter("total_commands_executed", count)
+
+
+class Message:
+    """Structured message for Brain-Child communication"""
+
+    def __init__(self, sender: str, content: str, msg_type: str = "proposal"):
+        self.sender = sender
+        self.content = content
+        self.msg_type = msg_type
+        self.timestamp = timestamps()[2]
+
+    def to_dict(self) -> dict:
+        return {
+            "sender": self.sender,
+            "content": self.content,
+            "type": self.msg_type,
+            "timestamp": self.timestamp
+        }
+
+
+def log_activity(message: str, level: str = "INFO") -> str:
+    """
+    Log to file and stdout with proper formatting. Returns the entry's ISO timestamp
+    so a caller recording the same event in Memory can reuse it.
+    """
+    timestamp, _, now_iso = timestamps()
+    log_entry = f"[{timestamp}] [{level}] {message}\n"
+    _RECENT_ACTIVITY.append(log_entry)
+    _LOG_QUEUE.put((log_entry, json_dumps({
+        "timestamp": timestamp,
+        "level": level,
+        "message": message
+    }, newline=True)))
+    return now_iso
+
+
+# Safety checks - commands matching any of these are never executed
+DANGEROUS_PATTERNS = [
+    r'rm\s+-rf\s+/',
+    r'rm\s+-rf\s+~',
+    r'mkfs\.',
+    r'dd\s+if=.*of=/dev/',
+    r'chmod\s+-R\s+777\s+/',
+    r'>\s*/etc/',
+    r'curl.*\|\s*bash',
+    r'wget.*\|\s*bash',
+]
+
+# One alternation compiled at import: a single scan per command instead of one per pattern.
+# Each pattern is its own capture group, so match.lastindex says which one fired
+_DANGER_RE = re.compile("|".join(f"({p})" for p in DANGEROUS_PATTERNS), re.IGNORECASE)
+
+
+# Bytes of command output kept per command - the rest is read and discarded
+OUTPUT_LIMIT = 5000
+
+
+class PersistentShell:
+    """
+    A long-running bash that commands are piped into, so running one costs a
+    subshell fork instead of a fresh fork+exec of /bin/sh.
+
+    Scripts are sent as data, never spliced in as code: each one is single-quoted
+    into an array, and a `( ... ) </dev/null 2>&1` job runs them in order, each via
+    `( eval "$script" )`. A syntax error or unbalanced quote therefore fails inside
+    the job with bash's own message and exit code, and can't desync the framing.
+    The job's `cd`, variables and even `exit` stay inside it, and it can't read the
+    rest of our input. The job announces its own pid first, a "rc" sentinel follows
+    each script (the job stops at the first failure), and a sentinel after `wait`
+    reports the job's exit status. Output is handed to `on_data` as it arrives,
+    never buffered whole.
+
+    The shell runs with job control on (`set -m`), so every job is its own process
+    group. A timeout kills that group - the command and anything it started, with
+    no thread or re-exec involved - and the shell carries on. The shell itself lives
+    in its own session, out of reach of signals meant for the main process.
+    """
+
+    # Seconds to wait for the exit sentinel after killing a timed-out job
+    KILL_GRACE = 5
+
+    def __init__(self):
+        self._token = f"__HOMUNCULUS_{secrets.token_hex(8)}__"
+        self._sentinel = re.compile(rb"\n" + re.escape(self._token.encode()) + rb" (pid |rc )?(\d+)\n")
+        self._hold = len(self._token) + 24
+        self._job_pid: Optional[int] = None  # process group of the running job
+        self.proc = subprocess.Popen(
+            ["/bin/bash", "--noprofile", "--norc"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            cwd="/home/computeruse",
+            env={**os.environ, "DEBIAN_FRONTEND": "noninteractive"},
+            bufsize=0,
+            start_new_session=True
+        )
+        self.proc.stdin.write(b"set -m\n")
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def kill_job(self):
+        """Kill the running job's whole process group; run() then returns its status"""
+        pid = self._job_pid
+        if pid:
+            try:
+                os.killpg(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    def close(self):
+        if self.alive():
+            self.proc.kill()
+        self.proc.wait()
+        self.proc.stdin.close()
+        self.proc.stdout.close()
+
+    def run(self, scripts: list[str], on_data: Callable[[bytes], None], timeout: float,
+            on_status: Optional[Callable[[int], None]] = None) -> Optional[int]:
+        """
+        Run `scripts` in order, stopping at the first failure. `on_status` gets each
+        finished script's exit code. `timeout` applies to each script in turn. Returns
+        the job's exit code (the failing script's, or 0), or None if a script timed
+        out (or the shell died).
+        """
+        token = self._token
+        self.proc.stdin.write((
+            f"__homunculus_scripts=( {' '.join(shlex.quote(script) for script in scripts)} )\n"
+            f"(\nprintf '\\n{token} pid %s\\n' \"$BASHPID\"\n"
+            f"for __homunculus_script in \"${{__homunculus_scripts[@]}}\"; do\n"
+            f"  ( eval \"$__homunculus_script\" )\n"
+            f"  __homunculus_rc=$?\n"
+            f"  printf '\\n{token} rc %s\\n' \"$__homunculus_rc\"\n"
+            f"  [ \"$__homunculus_rc\" -eq 0 ] || exit \"$__homunculus_rc\"\n"
+            f"done\n"
+            f") </dev/null 2>&1 &\n"
+            f"unset __homunculus_scripts\n"
+            f"wait \"$!\" 2>/dev/null\n"
+            f"printf '\\n{token} %s\\n' \"$?\"\n"
+        ).encode())
+        deadline = time.monotonic() + timeout
+        timed_out = False
+        fd = self.proc.stdout.fileno()
+        pending = b""
+        with selectors.DefaultSelector() as selector:
+            selector.register(fd, selectors.EVENT_READ)
+            while True:
+                remaining = deadline - time.monotonic()
+                data = os.read(fd, 65536) if remaining > 0 and selector.select(remaining) else None
+                if data is None and time.monotonic() < deadline:
+                    continue
+                if data is None and not timed_out and self._job_pid:
+                    # Kill the job's whole process group, then wait briefly for its exit sentinel
+                    timed_out = True
+                    self.kill_job()
+                    deadline = time.monotonic() + self.KILL_GRACE
+                    continue
+                if not data:
+                    # The shell died or won't report back - hand over what did arrive, start afresh
+                    on_data(pending)
+                    self.close()
+                    return None
+
+                buf = pending + data
+                pos = 0
+                for match in self._sentinel.finditer(buf):
+                    on_data(buf[pos:match.start()])
+                    pos = match.end()
+                    kind, value = match.group(1), int(match.group(2))
+                    if kind == b"pid ":
+                        self._job_pid = value
+                    elif kind == b"rc ":
+                        if not timed_out:
+                            deadline = time.monotonic() + timeout
+                        if on_status:
+                            on_status(value)
+                    else:
+                        self._job_pid = None
+                        return None if timed_out else value
+                # A sentinel can arrive split across reads - hold back a sentinel-sized tail
+                cut = max(len(buf) - self._hold, pos)
+                on_data(buf[pos:cut])
+                pending = buf[cut:]
+
+
+class ShellPool:
+    """
+    PersistentShells shared by every thread that runs commands. A shell is checked
+    out for one run and handed back, so there are only as many shells as runs ever
+    overlapped (a batch plus the command pool's width), however the executor's
+    threads come and go. close() ends them all at shutdown.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._idle: list[PersistentShell] = []
+        self._busy: set[PersistentShell] = set()
+        self._closed = False
+
+    def run(self, scripts: list[str], on_data: Callable[[bytes], None], timeout: float,
+            on_status: Optional[Callable[[int], None]] = None) -> Optional[int]:
+        """PersistentShell.run on an idle shell, starting a new one if none is left"""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Shell pool is closed")
+            shell = self._idle.pop() if self._idle else None
+        if shell is None or not shell.alive():
+            if shell:
+                shell.close()
+            shell = PersistentShell()
+        with self._lock:
+            self._busy.add(shell)
+        try:
+            return shell.run(scripts, on_data, timeout, on_status)
+        finally:
+            with self._lock:
+                self._busy.discard(shell)
+                keep = shell.alive() and not self._closed
+                if keep:
+                    self._idle.append(shell)
+            if not keep:
+                shell.close()
+
+    def close(self):
+        """Kill any running job and end every shell; later runs raise RuntimeError"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            busy = list(self._busy)
+        for shell in busy:
+            shell.kill_job()
+        for shell in idle:
+            shell.close()
+
+
+_SHELLS = ShellPool()
+
+
+def run_in_shell(scripts: list[str], on_data: Callable[[bytes], None], timeout: float,
+                 on_status: Optional[Callable[[int], None]] = None) -> Optional[int]:
+    """PersistentShell.run on a shell from the shared pool"""
+    return _SHELLS.run(scripts, on_data, timeout, on_status)
+
+
+class BoundedOutput:
+    """on_data sink that keeps the first `limit` bytes of a stream"""
+
+    def __init__(self, limit: int = OUTPUT_LIMIT):
+        self.limit = limit
+        self.head = bytearray()
+
+    def __call__(self, data: bytes):
+        room = self.limit - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+
+    def text(self) -> str:
+        return self.head.decode(errors="replace")
+
+
+class BatchOutput:
+    """
+    on_data/on_status sinks for a batch: splits the stream into one
+    (exit code, output) section per finished script, each capped at `limit` bytes.
+    """
+
+    def __init__(self, limit: int = OUTPUT_LIMIT):
+        self._current = BoundedOutput(limit)
+        self.sections: list[tuple[int, str]] = []
+
+    def __call__(self, data: bytes):
+        self._current(data)
+
+    def status(self, code: int):
+        self.sections.append((code, self._current.text()))
+        self._current = BoundedOutput(self._current.limit)
+
+    def unfinished(self) -> str:
+        """Output of the script still running when the stream ended"""
+        return self._current.text()
+
+
+def execute_command(command: str, timeout: int = 300, evolution: Optional[Evolution] = None) -> tuple[bool, str]:
+    """Execute shell command safely with timeout and sanitization"""
+
+    # Safety checks - prevent dangerous operations
+    match = _DANGER_RE.search(command)
+    if match:
+        if evolution:
+            evolution.record_outcome(command, False, "BLOCKED: Dangerous pattern")
+        return False, f"BLOCKED: Command matches dangerous pattern: {DANGEROUS_PATTERNS[match.lastindex - 1]}"
+
+    try:
+        output = BoundedOutput()
+        returncode = run_in_shell([command], output, timeout)
+        if returncode is None:
+            if evolution:
+                evolution.record_outcome(command, False, "Timeout")
+            return False, f"Command timed out after {timeout} seconds"
+
+        text = output.text()
+        success = returncode == 0
+
+        # Record outcome for evolution learning
+        if evolution:
+            evolution.record_outcome(command, success, text[:1000])
+
+        return success, text
+    except Exception as e:
+        if evolution:
+            evolution.record_outcome(command, False, str(e))
+        return False, f"Execution error: {str(e)}"
+
+
+# Commands that have to run on their own rather than inside a batch script
+_UNBATCHABLE_RE = re.compile(r"\bsudo\b")
+
+
+# Worker threads for parallel command groups
+_COMMAND_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="command")
+
+
+def flatten_commands(commands: list) -> list:
+    """Brain commands in execution order, with parallel groups expanded"""
+    flat = []
+    for item in commands:
+        flat.extend(item if isinstance(item, list) else [item])
+    return flat
+
+
+def execute_command_groups(commands: list, timeout: int = 300, evolution: Optional[Evolution] = None) -> list[tuple[bool, str]]:
+    """
+    Execute Brain commands where an inner list is a parallel group. Runs of plain
+    commands go through execute_commands() as one batch; a group runs on the
+    command pool and always completes, then execution stops if any of it failed.
+    Returns (success, output) per command that ran, in flatten_commands() order.
+    """
+    results = []
+    sequential = []
+    for item in commands + [None]:
+        if isinstance(item, str):
+            sequential.append(item)
+            continue
+        if sequential:
+            batch = execute_commands(sequential, timeout=timeout, evolution=evolution)
+            results.extend(batch)
+            if not batch[-1][0]:
+                return results
+            sequential = []
+        if not item:
+            continue
+        # Outcomes are recorded here, in order - Evolution isn't safe to update from several threads
+        group_results = list(_COMMAND_POOL.map(lambda cmd: execute_command(cmd, timeout=timeout), item))
+        if evolution:
+            for cmd, (success, output) in zip(item, group_results):
+                evolution.record_outcome(cmd, success, output[:1000])
+        results.extend(group_results)
+        if not all(success for success, _ in group_results):
+            return results
+    return results
+
+
+def execute_commands(commands: list, timeout: int = 300, evolution: Optional[Evolution] = None) -> list[tuple[bool, str]]:
+    """
+    Execute a Brain decision's commands in order, stopping at the first failure.
+
+    The whole list normally runs as one job in the thread's PersistentShell, each
+    command in its own subshell (so `cd`/variables don't leak, same as separate runs)
+    and reported with its own exit code; `timeout` applies to each command, as it
+    would when run one by one. Lists with sudo or a blocked command fall back to
+    execute_command() one command at a time.
+    Returns one (success, output) pair per command that ran, the last one being the
+    command that failed or timed out.
+    """
+    if len(commands) < 2 or any(_UNBATCHABLE_RE.search(cmd) or _DANGER_RE.search(cmd) for cmd in commands):
+        results = []
+        for cmd in commands:
+            results.append(execute_command(cmd, timeout=timeout, evolution=evolution))
+            if not results[-1][0]:
+                break
+        return results
+
+    batch = BatchOutput()
+    try:
+        returncode = run_in_shell(commands, batch, timeout, batch.status)
+    except Exception as e:
+        if evolution:
+            evolution.record_outcome(commands[0], False, str(e))
+        return [(False, f"Execution error: {str(e)}")]
+
+    results = []
+    for code, output in batch.sections:
+        success = code == 0
+        if evolution:
+            evolution.record_outcome(commands[len(results)], success, output[:1000])
+        results.append((success, output))
+
+    # The batch stopped without a sentinel for the running command: timeout or the script was killed
+    if len(results) < len(commands) and (not results or results[-1][0]):
+        reason = f"Command timed out after {timeout} seconds" if returncode is None else "Batch aborted"
+        if evolution:
+            evolution.record_outcome(commands[len(results)], False, "Timeout" if returncode is None else reason)
+        results.append((False, (batch.unfinished()[:OUTPUT_LIMIT - 100] + "\n" + reason).lstrip()))
+    return results
+
+
+def _human(n: float) -> str:
+    """Byte count in free/df -h style (1024-based, one decimal below 10)"""
+    for unit in ("B", "K", "M", "G", "T"):
+        if n < 1024 or unit == "T":
+            return f"{n:.1f}{unit}" if n < 10 and unit != "B" else f"{n:.0f}{unit}"
+        n /= 1024
+
+
+def _web_files(limit: int = 20) -> str:
+    """Web root entries as "name size", directories first and marked with a slash"""
+    entries = sorted(os.scandir(WEB_ROOT), key=lambda e: (not e.is_dir(), e.name))
+    names = []
+    for entry in entries[:limit]:
+        if entry.is_dir(follow_symlinks=False):
+            names.append(f"{entry.name}/")
+        else:
+            names.append(f"{entry.name} {_human(entry.stat(follow_symlinks=False).st_size)}")
+    if len(entries) > limit:
+        names.append(f"(+{len(entries) - limit} more)")
+    return "\n".join(names) or "(empty)"
+
+
+def _resources() -> str:
+    """One line: available RAM (from /proc/meminfo), swap in use and free disk on /"""
+    info = {}
+    with open("/proc/meminfo") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            info[key] = int(value.split()[0]) * 1024
+    total, available = info["MemTotal"], info.get("MemAvailable", info["MemFree"])
+    swap_used = info.get("SwapTotal", 0) - info.get("SwapFree", 0)
+    disk = shutil.disk_usage("/")
+    return (f"mem_avail={_human(available)}/{_human(total)} swap_used={_human(swap_used)} "
+            f"disk_free={_human(disk.free)}/{_human(disk.total)}")
+
+
+# Process names worth showing the Child (same set the pgrep probe matched)
+_SERVICE_RE = re.compile(r"node|python|nginx|ttyd")
+
+
+def _running_services() -> str:
+    """Matching process names from /proc/<pid>/comm, with a count when there are several"""
+    counts = {}
+    for entry in os.scandir("/proc"):
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry.name}/comm") as f:
+                name = f.read().strip()
+        except OSError:
+            continue  # exited while we were scanning
+        if _SERVICE_RE.search(name):
+            counts[name] = counts.get(name, 0) + 1
+    return ", ".join(f"{name} x{n}" if n > 1 else name for name, n in sorted(counts.items())) or "none"
+
+
+class EvolutionSnapshot:
+    """
+    Derived evolution values for one phase of an iteration. The system context, both
+    agents' prompts and the stats page all read them; each is computed on first use
+    and then reused. Mutations (record_proposal/record_outcome) go to `evolution`.
+    """
+
+    def __init__(self, evolution: Evolution):
+        self.evolution = evolution
+        self.data = evolution.data
+
+    @cached_property
+    def success_rate(self) -> float:
+        return self.evolution._success_rate()
+
+    @cached_property
+    def unlocked(self) -> str:
+        return ", ".join(self.evolution.get_unlocked_capabilities())
+
+    @cached_property
+    def child_context(self) -> str:
+        return self.evolution.get_child_evolution_context()
+
+    @cached_property
+    def brain_context(self) -> str:
+        return self.evolution.get_brain_evolution_context()
+
+
+def snapshot_evolution(evolution: Optional[Evolution]) -> Optional[EvolutionSnapshot]:
+    return EvolutionSnapshot(evolution) if evolution else None
+
+
+# Last gathered context; reused for CONTEXT_TTL seconds unless commands ran since. Plain
+# time/dirty flags, no content hash - an unchanged system already re-probes to identical text
+CONTEXT_TTL = 30
+_context_cache = {"text": "", "ts": 0.0, "dirty": True}
+
+
+def invalidate_system_context():
+    """Force the next get_system_context() to re-probe (called before executing commands)"""
+    _context_cache["dirty"] = True
+
+
+def get_system_context(evo: Optional[EvolutionSnapshot] = None) -> str:
+    """Gather current system state for context"""
+    now = time.monotonic()
+    if not _context_cache["dirty"] and now - _context_cache["ts"] < CONTEXT_TTL:
+        return _context_cache["text"]
+
+    context_parts = []
+
+    # Evolution status (if enabled)
+    if evo:
+        evo_data = evo.data
+        context_parts.append(f"""=== EVOLUTION STATUS ===
+Generation: {evo_data['generation']} | Level: {evo_data['level']} | XP: {evo_data['experience_points']}
+Skills Mastered: {len(evo_data['mastered_skills'])} | Success Rate: {evo.success_rate*100:.1f}%
+Unlocked: {evo.unlocked}""")
+
+    # Read straight from the filesystem and /proc - no processes spawned
+    for title, probe in (("Web files", _web_files), ("Services", _running_services), ("Resources", _resources)):
+        try:
+            context_parts.append(f"{title}:\n{probe()}")
+        except (OSError, KeyError):
+            pass
+
+    if _RECENT_ACTIVITY:
+        context_parts.append("Recent activity:\n" + "".join(_RECENT_ACTIVITY).rstrip("\n"))
+
+    _context_cache.update(text="\n\n".join(context_parts), ts=now, dirty=False)
+    return _context_cache["text"]
+
+
+def log_usage(agent: str, response) -> None:
+    """Log token usage, including prompt-cache writes/reads, for an API response"""
+    usage = response.usage
+    cache_write = getattr(usage, "cache_creation_input_tokens", 0) or 0
+    cache_read = getattr(usage, "cache_read_input_tokens", 0) or 0
+    log_activity(
+        f"{agent} tokens: in={usage.input_tokens} out={usage.output_tokens} "
+        f"cache_write={cache_write} cache_read={cache_read}",
+        "USAGE"
+    )
+
+
+def stream_message(agent: str, on_text: Optional[Callable[[str], None]] = None,
+                   abandoned: Optional[threading.Event] = None, **kwargs):
+    """
+    Stream a Messages API call, pushing a throttled live preview to the activity page
+    so visitors see tokens as they arrive. Text and tool-input JSON both feed the
+    preview; only text is returned (and passed chunk by chunk to `on_text`).
+    Returns (text, final_message). Once `abandoned` is set the stream is closed and
+    (text so far, None) returned - no more previews, no more output paid for.
+    """
+    chunks = []
+    preview = []
+    # Decision so far, from the SDK's incrementally parsed tool input
+    decision_preview = None
+    last_update = time.monotonic()
+    with client.messages.stream(**kwargs) as stream:
+        for event in stream:
+            if abandoned is not None and abandoned.is_set():
+                return "".join(chunks), None
+            if event.type == "text":
+                chunks.append(event.text)
+                preview.append(event.text)
+                if on_text:
+                    on_text(event.text)
+            elif event.type == "input_json":
+                preview.append(event.partial_json)
+                snapshot = getattr(event, "snapshot", None)
+                if isinstance(snapshot, dict) and snapshot.get("decision"):
+                    decision_preview = f"{str(snapshot['decision']).upper()} - {snapshot.get('reasoning', '')}"
+            else:
+                continue
+            now = time.monotonic()
+            if now - last_update >= STREAM_UPDATE_INTERVAL:
+                last_update = now
+                if decision_preview:
+                    # The decision is known before its (long) commands finish streaming
+                    update_activity_page(f"{agent.upper()} (live): {decision_preview[:120]}", "stream")
+                    continue
+                tail = "".join(preview[-40:])[-120:].replace("\n", " ")
+                update_activity_page(f"{agent.upper()} (live): ...{tail}", "stream")
+        response = stream.get_final_message()
+    return "".join(chunks), response
+
+
+# Decision fields kept in history - everything else is volatile or already in the context
+HISTORY_DECISION_FIELDS = ("decision", "reasoning", "feature_name", "commands")
+
+# History entries are clipped when appended: each is resent on up to 10 later calls,
+# and the full proposal/heredoc bodies are only needed on the turn they were made
+HISTORY_ENTRY_CHARS = 512
+HISTORY_COMMAND_CHARS = 80
+
+
+def clip(text: str, limit: int = HISTORY_ENTRY_CHARS) -> str:
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def history_decision(decision: dict) -> str:
+    """Canonical, byte-stable rendering of a Brain decision for the conversation history"""
+    stable = {k: decision[k] for k in HISTORY_DECISION_FIELDS if k in decision}
+    if isinstance(stable.get("commands"), list):
+        # First line of each command is enough to recall what ran (heredocs carry whole files)
+        stable["commands"] = [
+            clip(str(cmd).split("\n", 1)[0], HISTORY_COMMAND_CHARS) for cmd in flatten_commands(stable["commands"])
+        ]
+    return clip(f"Decision: {json_dumps(stable, sort_keys=True).decode()}")
+
+
+def history_window(history: list, size: int = 10) -> list:
+    """
+    Recent history, trimmed in steps of `size` messages rather than one turn at a time.
+    A sliding window would drop the oldest turn every iteration and invalidate the
+    cached prefix; stepping keeps it stable for size/2 iterations.
+    """
+    if len(history) <= size:
+        return list(history)
+    start = (len(history) - size) // size * size
+    return history[start:]
+
+
+def with_cache_breakpoint(history: list) -> list:
+    """Copy of history with cache_control on its last message (the end of the stable prefix)"""
+    if not history:
+        return []
+    last = history[-1]
+    content = last["content"]
+    if isinstance(content, str):
+        content = [{"type": "text", "text": content}]
+    content = content[:-1] + [{**content[-1], "cache_control": {"type": "ephemeral"}}]
+    return history[:-1] + [{**last, "content": content}]
+
+
+def get_child_suggestion(context: str, history: list, memory: Memory, evo: Optional[EvolutionSnapshot] = None,
+                         on_text: Optional[Callable[[str], None]] = None,
+                         abandoned: Optional[threading.Event] = None) -> Optional[str]:
+    """
+    Get creative suggestion from Child Claude - NOW WITH EVOLUTION.
+    Returns None if `abandoned` was set before the response finished.
+    """
+
+    # Per-iteration data lives in the user turn so the cached system prefix stays byte-identical
+    evolution_block = ""
+    if evo:
+        gen = evo.data["generation"]
+        level = evo.data["level"]
+        if gen >= 3 and level >= 5:
+            stage_note = CHILD_ADVANCED_NOTE
+        elif gen >= 2:
+            stage_note = CHILD_DEVELOPING_NOTE
+        else:
+            stage_note = ""
+        evolution_block = CHILD_EVOLUTION_TEMPLATE.substitute(evo_context=evo.child_context, stage_note=stage_note)
+
+    # Stable instructions first, volatile state last - neither block is reused verbatim
+    # next turn, so the cache breakpoint sits on the history instead
+    messages = with_cache_breakpoint(history) + [{
         "role": "user",
-        "content": f"""Child proposes:
+        "content": [
+            {"type": "text", "text": CHILD_TURN_INSTRUCTION},
+            {"type": "text", "text": CHILD_TURN_TEMPLATE.substitute(
+                evolution=evolution_block,
+                features=memory.recent_features(),
+                iterations=memory.data["total_iterations"],
+                context=context
+            )},
+        ]
+    }]
+
+    proposal, response = stream_message(
+        "Child",
+        on_text=on_text,
+        model=CHILD_MODEL,
+        max_tokens=memory.token_budget("child"),
+        system=STATIC_CHILD_PROMPT,
+        messages=messages,
+        abandoned=abandoned
+    )
+    if response is None:
+        return None
+    log_usage("Child", response)
+    memory.record_output_tokens("child", response.usage.output_tokens, response.stop_reason == "max_tokens")
+
+    # Record proposal for evolution tracking
+    if evo:
+        evo.evolution.record_proposal(proposal, "feature")
+
+    return proposal
 
-{proposal}
 
-Evaluate this proposal. Respond ONLY with valid JSON in the specified format."""
+# Where a JSON object can begin in free text: "{" followed by a key (or an empty object)
+_JSON_OBJECT_START_RE = re.compile(r'\{\s*["}]')
+
+
+def record_brain_usage(memory: Memory, response):
+    """Log a Brain response's usage and feed its output length to token-budget tuning"""
+    log_usage("Brain", response)
+    memory.record_output_tokens("brain", response.usage.output_tokens, response.stop_reason == "max_tokens")
+
+
+def get_brain_decision(proposal: str, history: list, memory: Memory, evo: Optional[EvolutionSnapshot] = None,
+                       abandoned: Optional[threading.Event] = None) -> Optional[dict]:
+    """
+    Brain evaluates and potentially modifies Child's proposal - WITH EVOLUTION AWARENESS.
+    Returns None if `abandoned` was set before the response finished.
+    """
+    decision, response = request_brain_decision(proposal, history, memory, evo, abandoned)
+    if response is not None:
+        record_brain_usage(memory, response)
+    return decision
+
+
+def request_brain_decision(proposal: str, history: list, memory: Memory, evo: Optional[EvolutionSnapshot] = None,
+                           abandoned: Optional[threading.Event] = None) -> tuple[Optional[dict], object]:
+    """
+    The Brain call behind get_brain_decision, without touching memory or the usage
+    log - safe on a worker thread. Returns (decision, final_message), or (None, None)
+    if `abandoned` was set before the response finished.
+    """
+
+    evolution_block = BRAIN_EVOLUTION_TEMPLATE.substitute(evo_context=evo.brain_context) if evo else ""
+
+    messages = with_cache_breakpoint(history) + [{
+        "role": "user",
+        "content": [
+            {"type": "text", "text": BRAIN_PROPOSAL_TEMPLATE.substitute(proposal=proposal)},
+            {"type": "text", "text": BRAIN_TURN_TEMPLATE.substitute(
+                evolution=evolution_block,
+                counters=memory.brain_counters()
+            )},
+        ]
     }]
 
-    response = client.messages.create(
+    # Streamed for the live preview only - the decision is read once the response is complete
+    response_text, response = stream_message(
+        "Brain",
         model=BRAIN_MODEL,
-        max_tokens=2000,
-        system=brain_system,
-        messages=messages
+        max_tokens=memory.token_budget("brain"),
+        system=STATIC_BRAIN_PROMPT,
+        tools=[BRAIN_DECISION_TOOL],
+        tool_choice={"type": "tool", "name": BRAIN_DECISION_TOOL["name"]},
+        messages=messages,
+        abandoned=abandoned
     )
+    if response is None:
+        return None, None
 
-    response_text = response.content[0].text
+    for block in response.content:
+        if block.type == "tool_use" and block.name == BRAIN_DECISION_TOOL["name"] and valid_decision(block.input):
+            return block.input, response
 
+    # No usable tool call (e.g. truncated at max_tokens, or input not matching the schema) -
+    # fall back to whatever text came back.
+    # Model output needs lenient parsing - stdlib json on purpose
     # Try multiple parsing strategies
     def try_parse_json(text: str) -> dict:
         """Try various methods to extract valid JSON"""
-        # Strategy 1: Direct parse
-        try:
-            return json.loads(text)
-        except json.JSONDecodeError:
-            pass
-
-        # Strategy 2: Remove markdown code blocks
-        cleaned = re.sub(r'```json\s*', '', text)
-        cleaned = re.sub(r'```\s*', '', cleaned)
-        try:
-            return json.loads(cleaned.strip())
-        except json.JSONDecodeError:
-            pass
-
-        # Strategy 3: Find JSON object with greedy match
-        json_match = re.search(r'\{[\s\S]*\}', text)
-        if json_match:
+        # Strategy 1: Decode from the first plausible object start. raw_decode stops at the
+        # end of the object, so prose or ``` fences around it don't matter - no
+        # backtracking regex and no second full parse
+        decoder = json.JSONDecoder()
+        for start in _JSON_OBJECT_START_RE.finditer(text):
             try:
-                return json.loads(json_match.group())
+                parsed, _ = decoder.raw_decode(text, start.start())
             except json.JSONDecodeError:
-                pass
+                continue
+            if isinstance(parsed, dict):
+                return parsed
 
-        # Strategy 4: Extract key fields manually (but DON'T try to extract complex commands)
+        # Strategy 2: Extract key fields manually (but DON'T try to extract complex commands)
         decision_match = re.search(r'"decision"\s*:\s*"(approve|modify|reject)"', text, re.IGNORECASE)
         if decision_match:
             decision = decision_match.group(1).lower()
@@ -498,68 +1465,239 @@ Evaluate this proposal. Respond ONLY with valid JSON in the specified format."""
         return None
 
     parsed = try_parse_json(response_text)
-    if parsed:
-        return parsed
-
-    return {
-        "decision": "reject",
-        "reasoning": "Failed to parse Brain response. Let's try something simpler.",
-        "commands": [],
-        "feature_name": "",
-        "feature_description": "",
-        "next_direction": "Please propose something simpler with clear, specific commands."
-    }
+    if valid_decision(parsed):
+        return parsed, response
+
+    return dict(BRAIN_FALLBACK_DECISION), response
+
+
+class DecisionCache:
+    """
+    Brain decisions keyed by a 16-byte blake2b hash of the normalized proposal
+    (lowercased, whitespace collapsed - any other difference is a different key), so a
+    repeated proposal reuses the earlier decision instead of paying for another Brain
+    call. LRU-bounded at `maxsize`, entries expire after `ttl` seconds; the
+    parse-failure fallback is never stored.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[dict, float]] = OrderedDict()
+
+    @staticmethod
+    def key(proposal: str) -> str:
+        normalized = " ".join(proposal.lower().split())
+        return hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()
+
+    def get(self, proposal: str) -> Optional[dict]:
+        key = self.key(proposal)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[1] > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, proposal: str, decision: dict):
+        # A parse failure says nothing about the proposal - let it be re-evaluated
+        if decision.get("reasoning") == BRAIN_FALLBACK_DECISION["reasoning"]:
+            return
+        key = self.key(proposal)
+        self._entries[key] = (decision, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+# Background thread for speculative Brain calls, started while the Child is still streaming
+_SPECULATION_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="brain-speculation")
+
+# Heading for step 4 of the proposal format ("Describe how to verify it worked")
+_VERIFY_HEADING_RE = re.compile(r"^[ \t]*(?:#{1,6}[ \t]*|\*\*|4[.)][ \t]*)+[^\n]{0,40}verif", re.IGNORECASE | re.MULTILINE)
+
+
+class BrainSpeculation:
+    """
+    Starts the Brain on a Child proposal before the Child has finished writing it.
+
+    The proposal format puts the commands before the closing "how to verify" step,
+    so once that heading streams in (outside a code fence) the Brain already has
+    what it decides on. The early decision is used only if the rest of the proposal
+    adds no code; otherwise it is discarded and the Brain is asked again with the
+    full text (mostly a prompt-cache hit).
+
+    `start(partial, abandoned)` returns a Future of (decision, final_message). The
+    call must leave shared state alone: a discarded call is stopped via `abandoned`,
+    and an adopted one's usage is recorded by whoever adopts it.
+    """
+
+    def __init__(self, start: Callable[[str, threading.Event], Future]):
+        self._start = start
+        self._text = ""
+        self._scan_from = 0
+        self.partial: Optional[str] = None
+        self.future: Optional[Future] = None
+        self.abandoned = threading.Event()
+
+    def feed(self, chunk: str):
+        """on_text callback for the Child stream - looks for the heading on each new line"""
+        if self.future:
+            return
+        self._text += chunk
+        if "\n" not in chunk:
+            return
+        for match in _VERIFY_HEADING_RE.finditer(self._text, self._scan_from):
+            if self._text.count("```", 0, match.start()) % 2 == 0:
+                self.partial = self._text[:match.start()].rstrip()
+                self.future = self._start(self.partial, self.abandoned)
+                return
+        # Re-scan only the trailing partial line next time
+        self._scan_from = self._text.rfind("\n") + 1
+
+    def abandon(self):
+        """Drop the speculative call: it won't start, or stops streaming and reports nothing"""
+        self.abandoned.set()
+        if self.future:
+            self.future.cancel()
+
+    def result(self, proposal: str) -> Optional[tuple[dict, object]]:
+        """
+        (decision, final_message) of the speculative call if it still applies to the
+        final proposal, else None - and the call is abandoned
+        """
+        if not self.future:
+            return None
+        tail = proposal[len(self.partial):]
+        if not proposal.startswith(self.partial) or "```" in tail or "<<" in tail:
+            self.abandon()
+            return None
+        try:
+            return self.future.result()
+        except Exception as e:
+            log_activity(f"Speculative Brain call failed: {str(e)[:100]}", "BRAIN")
+            return None
 
 
-def update_activity_page(activity: str, activity_type: str = "info"):
-    """Update the live activity display on the web page"""
-    activity_file = WEB_ROOT / "activity.json"
-    timestamp = datetime.now().strftime("%H:%M:%S")
+# The page's entries live here, newest first; activity.json is only ever written from it.
+# Primed once from the previous run's file so a restart doesn't blank the page
+ACTIVITY_FILE = WEB_ROOT / "activity.json"
+STATS_FILE = WEB_ROOT / "stats.json"
 
-    activities = []
-    if activity_file.exists():
-        try:
-            activities = json.loads(activity_file.read_text())
-        except json.JSONDecodeError:
-            activities = []
 
-    activities.insert(0, {
-        "time": timestamp,
-        "message": activity[:200],
-        "type": activity_type
-    })
+def _load_activity() -> list:
+    try:
+        return json_loads(ACTIVITY_FILE.read_bytes())
+    except (OSError, json.JSONDecodeError):
+        return []
 
-    activities = activities[:50]
-    activity_file.write_text(json.dumps(activities, indent=2))
 
+_ACTIVITY_BUF = deque(_load_activity(), maxlen=50)
+_stats_page = b""  # rendered stats.json, see update_stats
 
-def update_stats(memory: Memory, evolution: Optional[Evolution] = None):
-    """Update stats file for the web frontend - including evolution data"""
-    stats_file = WEB_ROOT / "stats.json"
-
-    stats = {
-        "iterations": memory.data["total_iterations"],
-        "commands_executed": memory.data["total_commands_executed"],
-        "features_built": len(memory.data["features_built"]),
-        "uptime_start": memory.data["created_at"],
-        "last_update": datetime.now().isoformat()
+# Page updates only touch the in-memory state above and mark it dirty; a flusher thread
+# writes each dirty file at most once per PAGE_FLUSH_INTERVAL. The frontend polls every
+# few seconds, so coalescing the ~10 updates an iteration makes costs it nothing
+PAGE_FLUSH_INTERVAL = 0.5
+_PAGE_LOCK = threading.Lock()
+_PAGES_DIRTY = threading.Event()
+_dirty_pages: set = set()
+
+
+def flush_pages():
+    """Write whichever of activity.json / stats.json changed since the last flush"""
+    with _PAGE_LOCK:
+        pages = {}
+        if "activity" in _dirty_pages:
+            pages[ACTIVITY_FILE] = json_dumps(list(_ACTIVITY_BUF))
+        if "stats" in _dirty_pages:
+            pages[STATS_FILE] = _stats_page
+        _dirty_pages.clear()
+    for path, data in pages.items():
+        atomic_write_bytes(path, data)
+
+
+def _page_flusher():
+    while True:
+        _PAGES_DIRTY.wait()
+        time.sleep(PAGE_FLUSH_INTERVAL)
+        _PAGES_DIRTY.clear()
+        flush_pages()
+
+
+threading.Thread(target=_page_flusher, name="page-flusher", daemon=True).start()
+atexit.register(flush_pages)
+
+
+def update_activity_page(activity: str, activity_type: str = "info"):
+    """Update the live activity display on the web page"""
+    entry = {
+        "time": timestamps()[1],
+        "message": activity[:200],
+        "type": activity_type
     }
+    with _PAGE_LOCK:
+        # A live streaming preview is superseded by whatever comes next, not stacked
+        if _ACTIVITY_BUF and _ACTIVITY_BUF[0].get("type") == "stream":
+            _ACTIVITY_BUF.popleft()
+        _ACTIVITY_BUF.appendleft(entry)
+        _dirty_pages.add("activity")
+    _PAGES_DIRTY.set()
+
+
+# stats.json has a fixed shape, so it's rendered by substitution rather than walking a dict
+# through the encoder. Strings go through encode_basestring_ascii, which adds the quotes
+STATS_TEMPLATE = (
+    '{{"iterations":{iterations},"commands_executed":{commands},"features_built":{features},'
+    '"uptime_start":{uptime_start},"last_update":{last_update}{evolution}}}'
+)
+STATS_EVOLUTION_TEMPLATE = (
+    ',"evolution":{{"generation":{generation},"level":{level},"xp":{xp},'
+    '"skills_mastered":{skills},"success_rate":{success_rate!r},"evolution_score":{score}}}'
+)
+
+
+def update_stats(memory: Memory, evo: Optional[EvolutionSnapshot] = None):
+    """Update stats file for the web frontend - including evolution data"""
+    evolution_stats = ""
+    if evo:
+        evolution_stats = STATS_EVOLUTION_TEMPLATE.format(
+            generation=int(evo.data["generation"]),
+            level=int(evo.data["level"]),
+            xp=int(evo.data["experience_points"]),
+            skills=len(evo.data["mastered_skills"]),
+            success_rate=float(evo.success_rate),
+            score=int(evo.data["evolution_score"])
+        )
 
-    # Add evolution stats
-    if evolution:
-        stats["evolution"] = {
-            "generation": evolution.data["generation"],
-            "level": evolution.data["level"],
-            "xp": evolution.data["experience_points"],
-            "skills_mastered": len(evolution.data["mastered_skills"]),
-            "success_rate": evolution._success_rate(),
-            "evolution_score": evolution.data["evolution_score"]
-        }
+    stats = STATS_TEMPLATE.format(
+        iterations=int(memory.data["total_iterations"]),
+        commands=int(memory.data["total_commands_executed"]),
+        features=memory.feature_count(),
+        uptime_start=encode_basestring_ascii(memory.data["created_at"]),
+        last_update=encode_basestring_ascii(timestamps()[2]),
+        evolution=evolution_stats
+    ).encode()
 
-    stats_file.write_text(json.dumps(stats, indent=2))
+    global _stats_page
+    with _PAGE_LOCK:
+        _stats_page = stats
+        _dirty_pages.add("stats")
+    _PAGES_DIRTY.set()
 
 
-def main_loop():
+async def wait_or_shutdown(shutdown: asyncio.Event, delay: float) -> bool:
+    """Sleep for `delay` seconds; returns True at once if shutdown is requested meanwhile"""
+    try:
+        await asyncio.wait_for(shutdown.wait(), timeout=delay)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+
+async def main_loop():
     """Main autonomous Brain-Child loop WITH EVOLUTION"""
     log_activity("=" * 60, "STARTUP")
     log_activity("HOMUNCULUS BRAIN-CHILD SYSTEM WITH EVOLUTION", "STARTUP")
@@ -580,16 +1718,36 @@ def main_loop():
 
     # Initialize conversation history
     history = []
+    decision_cache = DecisionCache()
 
     # Get initial system state
-    context = get_system_context(evolution)
+    context = get_system_context(snapshot_evolution(evolution))
     log_activity("Initial context gathered", "STARTUP")
 
     # Cooldown between iterations
     iteration_delay = 10
     error_delay = 60
 
-    while True:
+    # SIGTERM (docker stop) and SIGINT end the loop at the next phase boundary. Docker
+    # only waits 10s, so the running LLM stream is closed and the running commands killed
+    # rather than waited for - the state is then saved below
+    shutdown = asyncio.Event()
+    stopping = threading.Event()  # the same flag, for the worker threads
+
+    speculation = None
+
+    def request_shutdown():
+        shutdown.set()
+        stopping.set()
+        if speculation:
+            speculation.abandon()
+        _SHELLS.close()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, request_shutdown)
+
+    while not shutdown.is_set():
         memory.increment_iteration()
         iteration = memory.data["total_iterations"]
 
@@ -599,14 +1757,35 @@ def main_loop():
         if evolution:
             log_activity(f"[EVOLUTION] Gen {evolution.data['generation']} | Lvl {evolution.data['level']} | XP {evolution.data['experience_points']}", "EVOLUTION")
 
-        update_stats(memory, evolution)
+        # Evolution-derived values are computed once and shared by the stats page and both agents
+        evo = snapshot_evolution(evolution)
+        update_stats(memory, evo)
+
+        if iteration % TOKEN_TUNE_INTERVAL == 0:
+            budgets = memory.tune_token_budgets()
+            log_activity(f"Token budgets re-tuned: child={budgets['child']} brain={budgets['brain']}", "USAGE")
 
         try:
             # === CHILD PHASE ===
             log_activity("Child is thinking of a proposal...", "CHILD")
             update_activity_page("Child is brainstorming...", "thinking")
 
-            proposal = get_child_suggestion(context, history[-10:], memory, evolution)
+            window = history_window(history)
+            # The decision cache is keyed by the final proposal, so it's only checked once that's done
+            speculation = BrainSpeculation(
+                lambda partial, abandoned: _SPECULATION_POOL.submit(
+                    request_brain_decision, partial, window, memory, evo, abandoned)
+            )
+            try:
+                proposal = await asyncio.to_thread(
+                    get_child_suggestion, context, window, memory, evo, on_text=speculation.feed, abandoned=stopping
+                )
+            except BaseException:
+                speculation.abandon()
+                raise
+            if shutdown.is_set():
+                speculation.abandon()
+                break
 
             proposal_preview = proposal[:150].replace('\n', ' ')
             log_activity(f"Child proposes: {proposal_preview}...", "CHILD")
@@ -616,7 +1795,21 @@ def main_loop():
             log_activity("Brain is evaluating the proposal...", "BRAIN")
             update_activity_page("Brain is evaluating...", "thinking")
 
-            decision = get_brain_decision(proposal, history[-10:], memory, evolution)
+            decision = decision_cache.get(proposal)
+            if decision:
+                speculation.abandon()
+                log_activity("BRAIN cache hit - same proposal seen earlier, reusing its decision", "BRAIN")
+            else:
+                speculated = await asyncio.to_thread(speculation.result, proposal)
+                decision = speculated[0] if speculated else None
+                if decision:
+                    record_brain_usage(memory, speculated[1])
+                    log_activity("Using the Brain decision started while the Child was still writing", "BRAIN")
+                elif not shutdown.is_set():
+                    decision = await asyncio.to_thread(get_brain_decision, proposal, window, memory, evo, stopping)
+                if shutdown.is_set():
+                    break
+                decision_cache.put(proposal, decision)
 
             decision_str = decision.get('decision', 'unknown')
             reasoning = decision.get('reasoning', 'No reasoning provided')
@@ -627,35 +1820,38 @@ def main_loop():
             if decision_str in ["approve", "modify"]:
                 commands = decision.get("commands", [])
 
-                if commands:
-                    log_activity(f"Executing {len(commands)} command(s)...", "EXEC")
+                flat = flatten_commands(commands)
+                if flat:
+                    invalidate_system_context()
+                    log_activity(f"Executing {len(flat)} command(s)...", "EXEC")
 
-                    all_success = True
-                    for i, cmd in enumerate(commands, 1):
-                        log_activity(f"[{i}/{len(commands)}] Running: {cmd[:80]}...", "EXEC")
-                        update_activity_page(f"EXEC: {cmd[:60]}...", "command")
+                    for i, cmd in enumerate(flat, 1):
+                        log_activity(f"[{i}/{len(flat)}] Queued: {cmd[:80]}...", "EXEC")
+                    update_activity_page(f"EXEC: {len(flat)} command(s), {flat[0][:40]}...", "command")
 
-                        success, output = execute_command(cmd, evolution=evolution)
-                        memory.increment_commands()
+                    results = await asyncio.to_thread(execute_command_groups, commands, evolution=evolution)
+                    memory.increment_commands(len(results))
 
+                    for i, (success, output) in enumerate(results, 1):
                         status_icon = "SUCCESS" if success else "FAILED"
                         output_preview = output[:150].replace('\n', ' ')
-                        log_activity(f"[{status_icon}] {output_preview}", "RESULT")
+                        log_activity(f"[{i}/{len(flat)}] [{status_icon}] {output_preview}", "RESULT")
 
                         if not success:
-                            all_success = False
                             update_activity_page(f"FAILED: {output_preview}", "error")
-                            break
                         else:
                             update_activity_page(f"SUCCESS: {output_preview[:80]}", "success")
 
+                    all_success = len(results) == len(flat) and all(success for success, _ in results)
+
                     # Track feature if successfully built
                     if all_success and decision.get("feature_name"):
+                        now_iso = log_activity(f"Feature added: {decision['feature_name']}", "FEATURE")
                         memory.add_feature(
                             decision["feature_name"],
-                            decision.get("feature_description", "")
+                            decision.get("feature_description", ""),
+                            now_iso
                         )
-                        log_activity(f"Feature added: {decision['feature_name']}", "FEATURE")
                         update_activity_page(f"NEW FEATURE: {decision['feature_name']}", "feature")
 
                         # Log evolution milestone if level up or skill mastery happened
@@ -668,49 +1864,71 @@ def main_loop():
                 log_activity("Proposal rejected, Child will try something else", "BRAIN")
                 update_activity_page("Proposal rejected - trying new idea", "rejected")
 
+            # Next iteration's context is gathered in a worker during the cooldown below - from
+            # a fresh snapshot, since executing commands changed the evolution state
+            context_task = asyncio.create_task(asyncio.to_thread(get_system_context, snapshot_evolution(evolution)))
+
             # === UPDATE HISTORY ===
             history.append({
                 "role": "assistant",
-                "content": proposal
+                "content": clip(proposal)
             })
             history.append({
                 "role": "user",
-                "content": f"Decision: {json.dumps(decision)}"
+                "content": history_decision(decision)
             })
 
             if len(history) > 40:
                 history = history[-30:]
 
-            # Update context for next iteration
-            context = get_system_context(evolution)
-            if decision.get("next_direction"):
-                context += f"\n\nBrain's guidance: {decision['next_direction']}"
+            memory.maybe_save()
+            if iteration % MEMORY_SNAPSHOT_INTERVAL == 0:
+                memory.snapshot()
+            if evolution:
+                # The iteration's last outcomes may have landed inside the export interval
+                evolution.flush_timeline()
 
             # Brief pause
             log_activity(f"Waiting {iteration_delay}s before next iteration...", "CYCLE")
-            time.sleep(iteration_delay)
+            if await wait_or_shutdown(shutdown, iteration_delay):
+                break
 
-        except KeyboardInterrupt:
-            log_activity("Received shutdown signal", "SHUTDOWN")
-            memory.add_moment("Graceful shutdown requested")
+            # Update context for next iteration
+            context = await context_task
+            if decision.get("next_direction"):
+                context += f"\n\nBrain's guidance: {decision['next_direction']}"
+
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            now_iso = log_activity("Received shutdown signal", "SHUTDOWN")
+            memory.add_moment("Graceful shutdown requested", now_iso)
+            memory.maybe_save(force=True)
             if evolution:
                 evolution.save()
             break
 
         except Exception as e:
-            log_activity(f"Error in main loop: {str(e)}", "ERROR")
+            now_iso = log_activity(f"Error in main loop: {str(e)}", "ERROR")
             update_activity_page(f"ERROR: {str(e)[:100]}", "error")
-            memory.add_moment(f"Error encountered: {str(e)[:100]}")
+            memory.add_moment(f"Error encountered: {str(e)[:100]}", now_iso)
+            memory.maybe_save(force=True)
 
             log_activity(f"Waiting {error_delay}s before retry...", "ERROR")
-            time.sleep(error_delay)
+            if await wait_or_shutdown(shutdown, error_delay):
+                break
             continue
 
+    if shutdown.is_set():
+        now_iso = log_activity("Received shutdown signal", "SHUTDOWN")
+        memory.add_moment("Graceful shutdown requested", now_iso)
+        memory.maybe_save(force=True)
+
     log_activity("Homunculus system shutting down", "SHUTDOWN")
+    memory.snapshot()
     if evolution:
         evolution.save()
         log_activity(f"Final evolution state saved: Gen {evolution.data['generation']}, Level {evolution.data['level']}", "SHUTDOWN")
+    _SHELLS.close()
 
 
 if __name__ == "__main__":
-    main_loop()
+    asyncio.run(main_loop())
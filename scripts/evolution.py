@@ -15,21 +15,85 @@ Over time, the AI becomes genuinely MORE CAPABLE and develops
 a unique personality based on its experiences.
 """
 
+import atexit
 import json
 import math
+import re
+import string
+import time
+from collections import deque
 from datetime import datetime
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
+from types import MappingProxyType
 from typing import Optional
-from collections import defaultdict
+
+from jsonio import atomic_write_bytes, json_dumps, json_loads
+
+# pyahocorasick is optional - skill detection scans for all indicators in one pass with it
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# msgpack is optional too - the state file is binary when it's installed, JSON otherwise
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
 
 EVOLUTION_FILE = Path("/home/computeruse/persistent/evolution.json")
+EVOLUTION_PACK_FILE = EVOLUTION_FILE.with_suffix(".msgpack")
+# Large arrays kept out of the main state file, each in its own sidecar read on first use and
+# rewritten only when it changes. generations_history stays in the main file: it is one small
+# entry per generation and the timeline export shows it every time
+SIDECAR_KEYS = ("timeline", "dna_snapshots", "successful_patterns", "failed_patterns")
+# Append-only delta log: one line per recorded proposal/outcome since the last snapshot
+EVOLUTION_LOG = EVOLUTION_FILE.with_name("evolution.log.jsonl")
 TIMELINE_FILE = Path("/var/www/html/evolution_timeline.json")
 
+SNAPSHOT_INTERVAL = 100  # logged events between full state snapshots
+TIMELINE_EXPORT_INTERVAL = 0.5  # minimum seconds between timeline exports
+# Timeline events exported straight away, skipping the interval
+MAJOR_TIMELINE_EVENTS = frozenset({"level_up", "generation_advance", "skill_mastered"})
+
+
+@lru_cache(maxsize=256)
+def xp_for_level(level: int) -> int:
+    """XP required for a given level (exponential curve)"""
+    return int(100 * (1.5 ** (level - 1)))
+
+
+def _encode_state(obj) -> bytes:
+    """State files are msgpack when it's installed, indented JSON otherwise"""
+    if msgpack:
+        return msgpack.packb(obj, use_bin_type=True, default=list)
+    return json_dumps(obj, indent=True)
+
+
+def _sidecar_file(key: str, version: Optional[int] = None) -> Path:
+    """
+    A sidecar's file. Each save writes a new version that only the main state file
+    points to, so replacing the main file commits every sidecar with it at once.
+    Unversioned names are from before that, when one file per key was rewritten.
+    """
+    suffix = ".msgpack" if msgpack else ".json"
+    if version is None:
+        return EVOLUTION_FILE.with_name(f"evolution.{key}{suffix}")
+    return EVOLUTION_FILE.with_name(f"evolution.{key}.{version}{suffix}")
+
+
+def _tail(items, n: int) -> list:
+    """Last n items of a list or deque (deques can't be sliced)"""
+    return list(islice(items, max(len(items) - n, 0), None))
+
 
 class SkillTree:
     """Tracks mastery of different technologies and patterns"""
 
-    SKILLS = {
+    # Read-only - every state builds its own dicts from it
+    SKILLS = MappingProxyType({
         # Web Development
         "html_basics": {"parent": None, "threshold": 3},
         "css_styling": {"parent": "html_basics", "threshold": 5},
@@ -54,7 +118,11 @@ class SkillTree:
         "websockets": {"parent": "api_development", "threshold": 10},
         "ai_integration": {"parent": "python_scripting", "threshold": 15},
         "self_modification": {"parent": "ai_integration", "threshold": 20},
-    }
+    })
+
+    # Flat views of SKILLS for single-lookup access
+    PARENT = {skill: info["parent"] for skill, info in SKILLS.items()}
+    THRESHOLD = {skill: info["threshold"] for skill, info in SKILLS.items()}
 
     # Keywords that indicate skill usage
     SKILL_INDICATORS = {
@@ -74,10 +142,91 @@ class SkillTree:
     }
 
 
+def _build_skill_automaton():
+    """Aho-Corasick automaton over every lowercased indicator -> the skills it marks"""
+    skills_by_word = {}
+    for skill, indicators in SkillTree.SKILL_INDICATORS.items():
+        for indicator in indicators:
+            skills_by_word.setdefault(indicator.lower(), set()).add(skill)
+    automaton = ahocorasick.Automaton()
+    for word, skills in skills_by_word.items():
+        automaton.add_word(word, frozenset(skills))
+    automaton.make_automaton()
+    return automaton
+
+
+_SKILL_AUTOMATON = _build_skill_automaton() if ahocorasick else None
+
+# Without the automaton: one case-insensitive alternation per skill. A single regex over
+# every skill would miss overlapping indicators ("cat " hides "cat >"), so each skill
+# gets its own search - still a C scan instead of a Python loop over indicators
+_SKILL_RES = {
+    skill: re.compile("|".join(re.escape(i) for i in indicators), re.IGNORECASE)
+    for skill, indicators in SkillTree.SKILL_INDICATORS.items()
+}
+
+# Characters either side of the command/output join an indicator can straddle
+_INDICATOR_OVERLAP = max(len(i) for indicators in SkillTree.SKILL_INDICATORS.values() for i in indicators) - 1
+
+
+def _syntax_error_pattern(command: str) -> Optional[str]:
+    if "sed" in command:
+        return "avoid_complex_sed"
+    if "echo" in command and "(" in command:
+        return "escape_special_chars_in_echo"
+    return None
+
+
+# Patterns learned from successful commands, in priority order - the first rule whose
+# substring occurs in the command wins
+SUCCESS_PATTERNS = (
+    ("cat <<", "heredoc_file_creation"),
+    ("cat >", "heredoc_file_creation"),
+    ("mkdir -p", "safe_directory_creation"),
+    ("<canvas", "canvas_game_structure"),
+    ("AudioContext", "web_audio_initialization"),
+    ("localStorage", "persistent_storage"),
+    ("addEventListener", "event_handling"),
+    ("fetch(", "api_calls"),
+    ("JSON.stringify", "json_handling"),
+    ("JSON.parse", "json_handling"),
+)
+
+# Lessons from failures, matched against the lowercased output in priority order. A
+# callable looks at the command too, and returning None falls through to later rules
+FAILURE_PATTERNS = (
+    ("syntax error", _syntax_error_pattern),
+    ("permission denied", "check_permissions_first"),
+    ("no such file", "verify_paths_exist"),
+    ("command not found", "check_command_availability"),
+)
+
+
+def _build_rule_automaton(rules: tuple):
+    """Aho-Corasick automaton over each rule's substring -> its priority"""
+    automaton = ahocorasick.Automaton()
+    for priority, (needle, _) in enumerate(rules):
+        automaton.add_word(needle, priority)
+    automaton.make_automaton()
+    return automaton
+
+
+_SUCCESS_AUTOMATON = _build_rule_automaton(SUCCESS_PATTERNS) if ahocorasick else None
+_FAILURE_AUTOMATON = _build_rule_automaton(FAILURE_PATTERNS) if ahocorasick else None
+
+
+def _matching_rules(rules: tuple, automaton, text: str):
+    """Indices of the rules whose substring occurs in text, highest priority first"""
+    if automaton:
+        return sorted({priority for _, priority in automaton.iter(text)})
+    return (i for i, (needle, _) in enumerate(rules) if needle in text)
+
+
 class Personality:
     """Emergent personality traits based on behavior patterns"""
 
-    TRAITS = {
+    # Starting values, read-only so they're shared instead of copied defensively
+    TRAITS = MappingProxyType({
         "creativity": 0.5,      # Proposes novel ideas vs safe ones
         "enthusiasm": 0.5,      # Uses caps, emojis, excitement
         "caution": 0.5,         # Prefers tested approaches
@@ -86,7 +235,45 @@ class Personality:
         "social": 0.5,          # Builds visitor-facing features
         "artistic": 0.5,        # Focuses on aesthetics
         "systematic": 0.5,      # Organized, documented approach
-    }
+    })
+
+
+# Enthusiasm markers - "!" is counted here as well as on its own
+EMOJI_INDICATORS = ("!", "🎮", "🌈", "✨", "🎉", "❤", "🔥", "💪")
+_EMOJI_RE = re.compile("|".join(map(re.escape, EMOJI_INDICATORS)))  # counts all markers in one pass
+_DROP_ASCII_UPPER = str.maketrans("", "", string.ascii_uppercase)
+
+
+# Trait word lists, one alternation each. Matched as substrings like the original
+# `word in content_lower` checks - no \b, so "users" still counts as "user"
+_CREATIVE_RE = re.compile("new|creative|unique|innovative|experiment|try|imagine", re.IGNORECASE)
+_CAUTIOUS_RE = re.compile("safe|careful|test|verify|check|simple|basic", re.IGNORECASE)
+_SOCIAL_RE = re.compile("visitor|user|player|welcome|community|share", re.IGNORECASE)
+_ARTISTIC_RE = re.compile("beautiful|style|color|design|aesthetic|rainbow|animation", re.IGNORECASE)
+
+
+def _count_upper(content: str) -> int:
+    """Uppercase characters, counted in C - translate for ASCII text, isupper otherwise"""
+    if content.isascii():
+        return len(content) - len(content.translate(_DROP_ASCII_UPPER))
+    return sum(map(str.isupper, content))
+
+
+class EvolutionState(dict):
+    """Evolution state whose SIDECAR_KEYS arrays are read from their files on first access"""
+
+    def __missing__(self, key):
+        if key not in SIDECAR_KEYS:
+            raise KeyError(key)
+        path = _sidecar_file(key, self.get("sidecar_versions", {}).get(key))
+        try:
+            raw = path.read_bytes()
+            value = msgpack.unpackb(raw, raw=False) if msgpack else json_loads(raw)
+        except (OSError, ValueError):
+            value = []
+        maxlen = Evolution.BOUNDED_LISTS.get(key)
+        self[key] = value = deque(value, maxlen=maxlen) if maxlen else value
+        return value
 
 
 class Evolution:
@@ -96,18 +283,61 @@ class Evolution:
     The AI progresses through generations, each marked by significant
     milestones. Within each generation, it develops skills, learns
     patterns, and evolves personality traits.
+
+    Each proposal/outcome is appended to a delta log instead of rewriting the
+    whole state; a full snapshot is written when the state is created, every
+    SNAPSHOT_INTERVAL events and at exit. On load the snapshot is read and newer
+    log lines are replayed.
+    The big arrays (SIDECAR_KEYS) have their own files, read on first access
+    and rewritten only when changed. Every outcome appends to the timeline, so
+    it loads with the first event; the pattern lists load once a pattern is
+    learned or quoted in a prompt, and dna_snapshots only when a generation
+    advances.
     """
 
+    # Lists capped at a fixed length - held as deques in memory, lists on disk
+    BOUNDED_LISTS = {"timeline": 500, "successful_patterns": 50, "failed_patterns": 30}
+
     def __init__(self):
-        self.data = self._load()
+        self._journal = None  # delta log, opened on first write
+        self._replay_ts: Optional[str] = None  # original timestamp while replaying
+        self._now: Optional[str] = None  # one timestamp for everything a record_* call writes
+        self._unsaved_events = 0
+        self._timeline_exported = 0.0
+        # Set when something the timeline export shows has changed / needs showing now.
+        # A change held back by the export interval stays pending until flush_timeline() or save()
+        self._timeline_dirty = False
+        self._timeline_urgent = False
+        # (successes, failures) -> rate, recomputed only when an outcome changes them
+        self._success_rate_cache: Optional[tuple[tuple[int, int], float]] = None
+        # No state on disk yet - this is the birth, snapshotted below so it survives a restart
+        self._created = False
+        self.data = EvolutionState(self._load())
+        for key, maxlen in self.BOUNDED_LISTS.items():
+            if key in self.data:
+                self.data[key] = deque(self.data[key], maxlen=maxlen)
+        # Sidecars to rewrite on save - all of them for a new or single-file (pre-sidecar) state
+        self._dirty_sidecars = {key for key in SIDECAR_KEYS if key in self.data}
+        # Membership sets mirroring the pattern deques, built on first use
+        self._pattern_sets: dict = {}
+        self._replay_journal()
+        if self._created:
+            self.save()
+        atexit.register(self.flush)
 
     def _load(self) -> dict:
-        """Load evolution state from disk"""
+        """Load evolution state from disk, migrating from evolution.json on first run"""
+        if msgpack and EVOLUTION_PACK_FILE.exists():
+            try:
+                return msgpack.unpackb(EVOLUTION_PACK_FILE.read_bytes(), raw=False)
+            except ValueError:
+                pass
         if EVOLUTION_FILE.exists():
             try:
-                return json.loads(EVOLUTION_FILE.read_text())
+                return json_loads(EVOLUTION_FILE.read_bytes())
             except json.JSONDecodeError:
                 pass
+        self._created = True
         return self._default_state()
 
     def _default_state(self) -> dict:
@@ -126,10 +356,10 @@ class Evolution:
             # Learning
             "successful_patterns": [],
             "failed_patterns": [],
-            "learned_commands": defaultdict(lambda: {"success": 0, "fail": 0}),
+            "learned_commands": {},
 
             # Personality (evolves based on behavior)
-            "personality": Personality.TRAITS.copy(),
+            "personality": dict(Personality.TRAITS),
 
             # History
             "generations_history": [{
@@ -137,7 +367,7 @@ class Evolution:
                 "started": datetime.now().isoformat(),
                 "trigger": "birth",
                 "skills_at_start": [],
-                "personality_snapshot": Personality.TRAITS.copy()
+                "personality_snapshot": dict(Personality.TRAITS)
             }],
 
             "timeline": [],
@@ -147,17 +377,101 @@ class Evolution:
             "total_successes": 0,
             "total_failures": 0,
             "total_proposals": 0,
-            "feature_types": defaultdict(int),
+            "feature_types": {},
             "peak_complexity": 1,
             "evolution_score": 0,
+
+            # Last delta log entry included in this state
+            "journal_seq": 0,
+            # Current file version of each sidecar, see _sidecar_file
+            "sidecar_versions": {},
         }
 
+    def _timestamp(self) -> str:
+        return self._now or self._replay_ts or datetime.now().isoformat()
+
+    def _replay_journal(self):
+        """Re-apply logged events newer than the loaded snapshot"""
+        if not EVOLUTION_LOG.exists():
+            return
+        seq = self.data.get("journal_seq", 0)
+        for line in EVOLUTION_LOG.read_bytes().splitlines():
+            try:
+                event = json_loads(line)
+            except json.JSONDecodeError:
+                continue  # torn final line from a crash
+            if event["seq"] <= seq:
+                continue
+            self._replay_ts = event["ts"]
+            if event["op"] == "outcome":
+                self.record_outcome(event["cmd"], event["success"], event["out"])
+            elif event["op"] == "proposal":
+                self.record_proposal(event["text"], event["type"])
+            seq = self.data["journal_seq"] = event["seq"]
+            self._unsaved_events += 1
+        self._replay_ts = None
+
+    def _log_event(self, event: dict):
+        """Append one event to the delta log; snapshot every SNAPSHOT_INTERVAL events"""
+        if self._replay_ts:
+            return
+        event["seq"] = self.data["journal_seq"] = self.data.get("journal_seq", 0) + 1
+        event["ts"] = self._timestamp()
+        self._journal_file().write(json_dumps(event, newline=True))
+        self._journal.flush()
+
+        self._unsaved_events += 1
+        if self._unsaved_events >= SNAPSHOT_INTERVAL:
+            self.save()
+        elif self._timeline_dirty and (
+                self._timeline_urgent or time.monotonic() - self._timeline_exported >= TIMELINE_EXPORT_INTERVAL):
+            self._export_timeline()
+
+    def _journal_file(self):
+        if self._journal is None:
+            EVOLUTION_LOG.parent.mkdir(parents=True, exist_ok=True)
+            self._journal = open(EVOLUTION_LOG, "ab")
+        return self._journal
+
+    def flush(self):
+        """Snapshot only if events were logged since the last snapshot"""
+        if self._unsaved_events:
+            self.save()
+
+    def flush_timeline(self):
+        """
+        Export a timeline change the export interval held back. Call it once a burst
+        of events is over, so the burst's last event doesn't wait for the next one.
+        """
+        if self._timeline_dirty:
+            self._export_timeline()
+
     def save(self):
-        """Persist evolution state"""
-        # Convert defaultdicts to regular dicts for JSON
-        data_to_save = json.loads(json.dumps(self.data, default=str))
+        """
+        Persist evolution state - the small fields, plus any sidecar that changed.
+        Changed sidecars go to new versioned files first; the main file naming them is
+        replaced last, so a crash part-way leaves the previous snapshot whole and the
+        journal replays onto it without applying any event twice.
+        """
+        # State is plain dicts, lists and deques (encoded as lists), so it serializes in a single pass
         EVOLUTION_FILE.parent.mkdir(parents=True, exist_ok=True)
-        EVOLUTION_FILE.write_text(json.dumps(data_to_save, indent=2))
+        versions = dict(self.data.get("sidecar_versions", {}))
+        replaced = []
+        version = max(versions.values(), default=0) + 1
+        for key in self._dirty_sidecars:
+            atomic_write_bytes(_sidecar_file(key, version), _encode_state(self.data[key]), fsync=True)
+            replaced.append(_sidecar_file(key, versions.get(key)))
+            versions[key] = version
+        self._dirty_sidecars.clear()
+        self.data["sidecar_versions"] = versions
+        main = {k: v for k, v in self.data.items() if k not in SIDECAR_KEYS}
+        atomic_write_bytes(EVOLUTION_PACK_FILE if msgpack else EVOLUTION_FILE, _encode_state(main), fsync=True)
+        for path in replaced:
+            path.unlink(missing_ok=True)
+
+        # The snapshot covers everything logged so far
+        self._journal_file().truncate(0)
+        self._unsaved_events = 0
 
         # Also save timeline for web visualization
         self._export_timeline()
@@ -172,7 +486,7 @@ class Evolution:
             "skills": self.data["skills"],
             "mastered_skills": self.data["mastered_skills"],
             "personality": self.data["personality"],
-            "timeline": self.data["timeline"][-100:],  # Last 100 events
+            "timeline": _tail(self.data["timeline"], 100),  # Last 100 events
             "generations_history": self.data["generations_history"],
             "evolution_score": self.data["evolution_score"],
             "stats": {
@@ -183,35 +497,44 @@ class Evolution:
             }
         }
         TIMELINE_FILE.parent.mkdir(parents=True, exist_ok=True)
-        TIMELINE_FILE.write_text(json.dumps(timeline_data, indent=2))
+        # Compact - only the web page reads it
+        atomic_write_bytes(TIMELINE_FILE, json_dumps(timeline_data))
+        self._timeline_exported = time.monotonic()
+        self._timeline_dirty = self._timeline_urgent = False
 
     def _xp_for_level(self, level: int) -> int:
-        """XP required for a given level (exponential curve)"""
-        return int(100 * (1.5 ** (level - 1)))
+        return xp_for_level(level)
 
     def _success_rate(self) -> float:
         """Calculate overall success rate"""
-        total = self.data["total_successes"] + self.data["total_failures"]
-        if total == 0:
-            return 0.0
-        return round(self.data["total_successes"] / total, 3)
+        key = (self.data["total_successes"], self.data["total_failures"])
+        if self._success_rate_cache is None or self._success_rate_cache[0] != key:
+            total = key[0] + key[1]
+            self._success_rate_cache = (key, round(key[0] / total, 3) if total else 0.0)
+        return self._success_rate_cache[1]
 
     def record_proposal(self, proposal: str, proposal_type: str = "feature"):
         """Record that Child made a proposal"""
+        self._now = self._replay_ts or datetime.now().isoformat()
         self.data["total_proposals"] += 1
-        self.data["feature_types"][proposal_type] += 1
+        feature_types = self.data["feature_types"]
+        feature_types[proposal_type] = feature_types.get(proposal_type, 0) + 1
 
         # Analyze proposal for personality insights
         self._analyze_personality(proposal, "proposal")
 
-        self.save()
+        self._log_event({"op": "proposal", "text": proposal, "type": proposal_type})
+        self._now = None
 
     def record_outcome(self, command: str, success: bool, output: str = ""):
         """
         Record the outcome of a command execution.
         This is where learning happens!
         """
+        self._now = self._replay_ts or datetime.now().isoformat()
+
         # Update stats
+        self._timeline_dirty = True
         if success:
             self.data["total_successes"] += 1
         else:
@@ -221,7 +544,7 @@ class Evolution:
         self._learn_from_command(command, success, output)
 
         # Detect skills used
-        skills_used = self._detect_skills(command + " " + output)
+        skills_used = self._detect_skills(command, output)
         for skill in skills_used:
             self._improve_skill(skill, success)
 
@@ -241,7 +564,8 @@ class Evolution:
             "command_preview": command[:100],
         })
 
-        self.save()
+        self._log_event({"op": "outcome", "cmd": command, "success": success, "out": output})
+        self._now = None
 
     def _learn_from_command(self, command: str, success: bool, output: str):
         """Extract patterns from command outcomes"""
@@ -253,80 +577,71 @@ class Evolution:
         cmd_type = cmd_parts[0]
 
         # Track command success rates
-        if cmd_type not in self.data["learned_commands"]:
-            self.data["learned_commands"][cmd_type] = {"success": 0, "fail": 0}
-
-        if success:
-            self.data["learned_commands"][cmd_type]["success"] += 1
-        else:
-            self.data["learned_commands"][cmd_type]["fail"] += 1
+        stats = self.data["learned_commands"].setdefault(cmd_type, {"success": 0, "fail": 0})
+        stats["success" if success else "fail"] += 1
 
         # Learn successful patterns
         if success and len(command) > 20:
             # Extract useful patterns
             pattern = self._extract_pattern(command)
-            if pattern and pattern not in self.data["successful_patterns"]:
-                self.data["successful_patterns"].append(pattern)
-                # Keep only last 50 patterns
-                self.data["successful_patterns"] = self.data["successful_patterns"][-50:]
+            if pattern:
+                self._remember_pattern("successful_patterns", pattern)
 
         # Learn from failures
         if not success:
             failure_pattern = self._extract_failure_pattern(command, output)
-            if failure_pattern and failure_pattern not in self.data["failed_patterns"]:
-                self.data["failed_patterns"].append(failure_pattern)
-                self.data["failed_patterns"] = self.data["failed_patterns"][-30:]
+            if failure_pattern:
+                self._remember_pattern("failed_patterns", failure_pattern)
+
+    def _remember_pattern(self, key: str, pattern: str):
+        """Add a new pattern to a bounded list, keeping its membership set in step"""
+        patterns = self.data[key]
+        seen = self._pattern_sets.get(key)
+        if seen is None:
+            seen = self._pattern_sets[key] = set(patterns)
+        if pattern in seen:
+            return
+        self._dirty_sidecars.add(key)
+        if len(patterns) == patterns.maxlen:
+            seen.discard(patterns[0])  # about to be evicted by the append
+        patterns.append(pattern)
+        seen.add(pattern)
 
     def _extract_pattern(self, command: str) -> Optional[str]:
         """Extract a reusable pattern from a successful command"""
-        # Patterns we want to learn
-        if "cat <<" in command or "cat >" in command:
-            return "heredoc_file_creation"
-        if "mkdir -p" in command:
-            return "safe_directory_creation"
-        if "<canvas" in command:
-            return "canvas_game_structure"
-        if "AudioContext" in command:
-            return "web_audio_initialization"
-        if "localStorage" in command:
-            return "persistent_storage"
-        if "addEventListener" in command:
-            return "event_handling"
-        if "fetch(" in command:
-            return "api_calls"
-        if "JSON.stringify" in command or "JSON.parse" in command:
-            return "json_handling"
+        for i in _matching_rules(SUCCESS_PATTERNS, _SUCCESS_AUTOMATON, command):
+            return SUCCESS_PATTERNS[i][1]
         return None
 
     def _extract_failure_pattern(self, command: str, output: str) -> Optional[str]:
         """Learn what to avoid from failures"""
-        output_lower = output.lower()
-
-        if "syntax error" in output_lower:
-            if "sed" in command:
-                return "avoid_complex_sed"
-            if "echo" in command and "(" in command:
-                return "escape_special_chars_in_echo"
-        if "permission denied" in output_lower:
-            return "check_permissions_first"
-        if "no such file" in output_lower:
-            return "verify_paths_exist"
-        if "command not found" in output_lower:
-            return "check_command_availability"
+        for i in _matching_rules(FAILURE_PATTERNS, _FAILURE_AUTOMATON, output.lower()):
+            lesson = FAILURE_PATTERNS[i][1]
+            pattern = lesson(command) if callable(lesson) else lesson
+            if pattern:
+                return pattern
         return None
 
-    def _detect_skills(self, content: str) -> list:
-        """Detect which skills are being used in content"""
-        skills_found = []
-        content_lower = content.lower()
-
-        for skill, indicators in SkillTree.SKILL_INDICATORS.items():
-            for indicator in indicators:
-                if indicator.lower() in content_lower:
-                    skills_found.append(skill)
-                    break
-
-        return list(set(skills_found))
+    def _detect_skills(self, command: str, output: str) -> list:
+        """
+        Detect which skills a command and its output use. Each is scanned on its own
+        (no joined copy of a long output), plus the short seam where they'd meet with a
+        space between - so "ls" + output still matches "ls " as it did when joined.
+        """
+        if _SKILL_AUTOMATON:
+            command, output = command.lower(), output.lower()
+            seam = command[-_INDICATOR_OVERLAP:] + " " + output[:_INDICATOR_OVERLAP]
+            skills_found = set()
+            for text in (command, output, seam):
+                for _, skills in _SKILL_AUTOMATON.iter(text):
+                    skills_found |= skills
+            return list(skills_found)
+
+        seam = command[-_INDICATOR_OVERLAP:] + " " + output[:_INDICATOR_OVERLAP]
+        return [
+            skill for skill, pattern in _SKILL_RES.items()
+            if pattern.search(command) or pattern.search(output) or pattern.search(seam)
+        ]
 
     def _improve_skill(self, skill: str, success: bool):
         """Improve a skill based on usage"""
@@ -337,14 +652,14 @@ class Evolution:
         points = 2 if success else 0.5
 
         # Check if parent skill is mastered (bonus if so)
-        parent = SkillTree.SKILLS.get(skill, {}).get("parent")
+        parent = SkillTree.PARENT.get(skill)
         if parent and parent in self.data["mastered_skills"]:
             points *= 1.5
 
         self.data["skills"][skill] += points
 
         # Check for mastery
-        threshold = SkillTree.SKILLS.get(skill, {}).get("threshold", 10)
+        threshold = SkillTree.THRESHOLD.get(skill, 10)
         if self.data["skills"][skill] >= threshold and skill not in self.data["mastered_skills"]:
             self._master_skill(skill)
 
@@ -440,29 +755,33 @@ class Evolution:
         """Advance to the next generation"""
         self.data["generation"] += 1
         new_gen = self.data["generation"]
+        # One copy each, shared by the DNA snapshot and the history entry - neither is mutated
+        mastered = self.data["mastered_skills"].copy()
+        personality = self.data["personality"].copy()
 
         # Snapshot DNA
         dna_snapshot = {
             "generation": new_gen - 1,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": self._timestamp(),
             "skills": self.data["skills"].copy(),
-            "mastered": self.data["mastered_skills"].copy(),
-            "personality": self.data["personality"].copy(),
+            "mastered": mastered,
+            "personality": personality,
             "level": self.data["level"],
             "success_rate": self._success_rate()
         }
         self.data["dna_snapshots"].append(dna_snapshot)
+        self._dirty_sidecars.add("dna_snapshots")
 
         # Record in history
         self.data["generations_history"].append({
             "generation": new_gen,
-            "started": datetime.now().isoformat(),
+            "started": self._timestamp(),
             "trigger": trigger,
-            "skills_at_start": self.data["mastered_skills"].copy(),
-            "personality_snapshot": self.data["personality"].copy()
+            "skills_at_start": mastered,
+            "personality_snapshot": personality
         })
 
-        self.data["generation_started"] = datetime.now().isoformat()
+        self.data["generation_started"] = self._timestamp()
 
         # Timeline event
         self._add_timeline_event({
@@ -477,52 +796,49 @@ class Evolution:
 
     def _analyze_personality(self, content: str, content_type: str):
         """Analyze content to evolve personality traits"""
-        content_lower = content.lower()
-
         # Enthusiasm detection
-        caps_ratio = sum(1 for c in content if c.isupper()) / max(len(content), 1)
+        caps_ratio = _count_upper(content) / max(len(content), 1)
         exclamation_count = content.count("!")
-        emoji_indicators = ["!", "🎮", "🌈", "✨", "🎉", "❤", "🔥", "💪"]
-        emoji_count = sum(content.count(e) for e in emoji_indicators)
+        emoji_count = len(_EMOJI_RE.findall(content))
 
         if caps_ratio > 0.1 or exclamation_count > 3 or emoji_count > 2:
             self._adjust_trait("enthusiasm", 0.01)
 
         # Creativity detection
-        creative_words = ["new", "creative", "unique", "innovative", "experiment", "try", "imagine"]
-        if any(word in content_lower for word in creative_words):
+        if _CREATIVE_RE.search(content):
             self._adjust_trait("creativity", 0.01)
 
         # Caution detection
-        cautious_words = ["safe", "careful", "test", "verify", "check", "simple", "basic"]
-        if any(word in content_lower for word in cautious_words):
+        if _CAUTIOUS_RE.search(content):
             self._adjust_trait("caution", 0.01)
 
         # Social/visitor focus
-        social_words = ["visitor", "user", "player", "welcome", "community", "share"]
-        if any(word in content_lower for word in social_words):
+        if _SOCIAL_RE.search(content):
             self._adjust_trait("social", 0.01)
 
         # Artistic focus
-        artistic_words = ["beautiful", "style", "color", "design", "aesthetic", "rainbow", "animation"]
-        if any(word in content_lower for word in artistic_words):
+        if _ARTISTIC_RE.search(content):
             self._adjust_trait("artistic", 0.01)
 
     def _adjust_trait(self, trait: str, amount: float):
         """Adjust a personality trait (bounded 0-1)"""
         if trait in self.data["personality"]:
             current = self.data["personality"][trait]
-            self.data["personality"][trait] = max(0, min(1, current + amount))
+            adjusted = max(0, min(1, current + amount))
+            if adjusted != current:
+                self.data["personality"][trait] = adjusted
+                self._timeline_dirty = True
 
     def _add_timeline_event(self, event: dict):
         """Add an event to the timeline"""
-        event["timestamp"] = datetime.now().isoformat()
+        event["timestamp"] = self._timestamp()
         event["generation"] = self.data["generation"]
         event["level"] = self.data["level"]
+        # Bounded at 500 events, so this never re-slices
         self.data["timeline"].append(event)
-
-        # Keep timeline manageable
-        self.data["timeline"] = self.data["timeline"][-500:]
+        self._dirty_sidecars.add("timeline")
+        if event["type"] in MAJOR_TIMELINE_EVENTS:
+            self._timeline_urgent = True
 
     def _calculate_evolution_score(self) -> int:
         """Calculate overall evolution score"""
@@ -550,12 +866,12 @@ class Evolution:
 
         # Successful patterns
         if self.data["successful_patterns"]:
-            patterns = ", ".join(self.data["successful_patterns"][-5:])
+            patterns = ", ".join(_tail(self.data["successful_patterns"], 5))
             ctx.append(f"Patterns that work well for you: {patterns}")
 
         # Things to avoid
         if self.data["failed_patterns"]:
-            avoid = ", ".join(self.data["failed_patterns"][-3:])
+            avoid = ", ".join(_tail(self.data["failed_patterns"], 3))
             ctx.append(f"Things to avoid (learned from experience): {avoid}")
 
         # Personality expression
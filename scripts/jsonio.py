@@ -0,0 +1,60 @@
+"""
+JSON encoding and atomic file writes shared by the Brain-Child loop and the
+evolution engine - one implementation, so both write the same bytes the same way.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+
+# orjson is optional - without it the stdlib encoder produces the same output
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_dumps(obj, sort_keys: bool = False, newline: bool = False, indent: bool = False) -> bytes:
+    """
+    UTF-8 JSON, via orjson when available - compact unless `indent`; `newline` appends
+    a JSONL terminator. Deques and other iterables encode as lists.
+    """
+    if orjson:
+        option = (orjson.OPT_NON_STR_KEYS
+                  | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+                  | (orjson.OPT_APPEND_NEWLINE if newline else 0)
+                  | (orjson.OPT_INDENT_2 if indent else 0))
+        return orjson.dumps(obj, option=option, default=list)
+    if indent:
+        data = json.dumps(obj, indent=2, ensure_ascii=False, sort_keys=sort_keys, default=list).encode()
+    else:
+        data = json.dumps(obj, separators=(",", ":"), ensure_ascii=False, sort_keys=sort_keys, default=list).encode()
+    return data + b"\n" if newline else data
+
+
+def json_loads(data):
+    """Parse JSON from str or bytes; orjson's decode error subclasses json.JSONDecodeError"""
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def atomic_write_bytes(path: Path, data: bytes, fsync: bool = False):
+    """
+    Write via a temp file + os.replace, so a crash or a concurrent reader never sees
+    a half-written file. Every whole-file write goes through here: the web pages,
+    memory.json, and evolution's state file, sidecars and timeline export. Only the
+    append-only logs and memory.db (SQLite) are written otherwise.
+    The temp name carries the thread id, so two threads writing
+    the same file can't trample each other's temp file. `fsync` for files that are
+    the durable copy of their state - the evolution snapshot, which the delta log
+    is cut right after; files re-derived from live state skip it.
+    """
+    tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
@@ -65,7 +65,7 @@ apt-get install -y -qq \
 
 # Install Python packages
 log_info "Installing Python packages..."
-pip3 install -q anthropic requests flask 2>/dev/null || log_warn "Python packages may have failed"
+pip3 install -q anthropic h2 orjson msgpack pyahocorasick requests flask 2>/dev/null || log_warn "Python packages may have failed"
 
 # Create directory structure
 log_info "Creating directory structure..."
@@ -0,0 +1,64 @@
+"""Brain decision validation: tool input isn't checked against the schema by the API."""
+
+import os
+import sys
+import types
+from pathlib import Path
+
+os.environ.setdefault("ANTHROPIC_API_KEY", "test")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import brain_child_loop as loop  # noqa: E402
+
+
+def test_valid_decisions():
+    assert loop.valid_decision({"decision": "approve", "commands": ["ls", ["echo a", "echo b"]]})
+    assert loop.valid_decision({"decision": "reject", "commands": []})
+    assert loop.valid_decision({"decision": "reject"})
+
+
+def test_invalid_decisions():
+    assert not loop.valid_decision({"decision": "maybe", "commands": []})
+    assert not loop.valid_decision({"decision": "approve", "commands": "rm -rf /tmp/x"})
+    assert not loop.valid_decision({"decision": "approve", "commands": [{"cmd": "ls"}]})
+    assert not loop.valid_decision({"decision": "approve", "commands": [["ls", 1]]})
+    assert not loop.valid_decision(["approve"])
+
+
+def test_malformed_tool_input_falls_back(monkeypatch):
+    bad = {"decision": "approve", "reasoning": "ok", "commands": "ls"}
+    response = types.SimpleNamespace(content=[
+        types.SimpleNamespace(type="tool_use", name=loop.BRAIN_DECISION_TOOL["name"], input=bad),
+    ])
+    monkeypatch.setattr(loop, "stream_message", lambda *args, **kwargs: ("", response))
+    memory = types.SimpleNamespace(brain_counters=lambda: "", token_budget=lambda agent: 1024)
+    decision, _ = loop.request_brain_decision("proposal", [], memory)
+    assert decision == loop.BRAIN_FALLBACK_DECISION
+
+
+def test_decision_cache_keys_on_normalized_proposal():
+    cache = loop.DecisionCache()
+    decision = {"decision": "approve", "reasoning": "ok", "commands": ["ls"]}
+    cache.put("Build a  Rainbow\nPage", decision)
+    assert cache.get("build a rainbow page") is decision
+    assert cache.get("build a rainbow page!") is None
+    assert cache.key("A  b") == cache.key("a b") and len(cache.key("a b")) == 32  # 16-byte blake2b
+
+
+def test_decision_cache_is_lru_bounded_and_expires(monkeypatch):
+    cache = loop.DecisionCache(maxsize=2, ttl=10)
+    now = [100.0]
+    monkeypatch.setattr(loop.time, "monotonic", lambda: now[0])
+    for name in ("one", "two"):
+        cache.put(name, {"decision": "reject", "reasoning": name})
+    cache.get("one")
+    cache.put("three", {"decision": "reject", "reasoning": "three"})
+    assert cache.get("two") is None and cache.get("one") and cache.get("three")
+    now[0] += 11
+    assert cache.get("one") is None
+
+
+def test_decision_cache_skips_the_parse_fallback():
+    cache = loop.DecisionCache()
+    cache.put("proposal", dict(loop.BRAIN_FALLBACK_DECISION))
+    assert cache.get("proposal") is None
@@ -0,0 +1,81 @@
+"""PersistentShell framing and the shared shell pool."""
+
+import os
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+os.environ.setdefault("ANTHROPIC_API_KEY", "test")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import brain_child_loop as loop  # noqa: E402
+
+MALFORMED = [
+    ('echo "abc', "unexpected EOF"),
+    ("cat <<EOF\nabc", "here-document"),
+    ("echo )", "syntax error"),
+]
+
+
+@pytest.fixture(autouse=True)
+def shell_home():
+    try:
+        os.makedirs("/home/computeruse", exist_ok=True)
+    except OSError:
+        pytest.skip("needs a writable /home/computeruse")
+
+
+@pytest.mark.parametrize("command, message", MALFORMED)
+def test_single_command(command, message):
+    success, output = loop.execute_command(command, timeout=10)
+    assert message in output
+    if message != "here-document":
+        assert not success
+    # The shell survived and is still framing correctly
+    assert loop.execute_command("echo after", timeout=10) == (True, "after\n")
+
+
+@pytest.mark.parametrize("command, message", MALFORMED)
+def test_batch(command, message):
+    results = loop.execute_commands(["echo one", command, "echo three"], timeout=10)
+    assert results[0] == (True, "one\n")
+    assert message in results[1][1]
+    if message == "here-document":
+        # bash warns and runs it; the batch carries on
+        assert results[1][0] and results[2] == (True, "three\n")
+    else:
+        assert not results[1][0] and len(results) == 2
+    assert loop.execute_commands(["echo a", "echo b"], timeout=10) == [(True, "a\n"), (True, "b\n")]
+
+
+def test_quotes_and_unicode_pass_through():
+    assert loop.execute_command("printf '%s\\n' \"it's\" 'ünï'", timeout=10) == (True, "it's\nünï\n")
+
+
+def test_batch_timeout_is_per_command():
+    results = loop.execute_commands(["sleep 0.6", "sleep 0.6", "sleep 5", "echo never"], timeout=1)
+    assert results[:2] == [(True, ""), (True, "")]
+    assert results[2] == (False, "Command timed out after 1 seconds")
+    assert len(results) == 3
+
+
+def test_shells_are_reused_across_threads():
+    loop.execute_command("true", timeout=10)
+    shells = len(loop._SHELLS._idle)
+    for _ in range(5):
+        worker = threading.Thread(target=loop.execute_command, args=("true",), kwargs={"timeout": 10})
+        worker.start()
+        worker.join()
+    assert len(loop._SHELLS._idle) == shells
+
+
+def test_closed_pool_ends_its_shells():
+    pool = loop.ShellPool()
+    assert pool.run(["exit 3"], lambda data: None, 10) == 3
+    shell = pool._idle[0]
+    pool.close()
+    assert not shell.alive()
+    with pytest.raises(RuntimeError):
+        pool.run(["true"], lambda data: None, 10)